@@ -1,22 +1,24 @@
-from flask import Flask, render_template, request, redirect, url_for, flash, session, jsonify, send_from_directory
+from flask import Flask, Request, render_template, request, redirect, url_for, flash, session, jsonify, send_from_directory, Response, stream_with_context
 from flask_sqlalchemy import SQLAlchemy
 from flask_bcrypt import Bcrypt
 from flask_login import LoginManager, UserMixin, login_user, login_required, logout_user, current_user
+from sqlalchemy.orm.attributes import set_committed_value
 from flask_wtf import FlaskForm
 from wtforms import StringField, PasswordField, SelectField, SubmitField, BooleanField
 from wtforms.validators import DataRequired, Length, Email, ValidationError
 from werkzeug.security import generate_password_hash, check_password_hash
 from werkzeug.utils import secure_filename
+from werkzeug.middleware.proxy_fix import ProxyFix
+import io
 import os
 import logging
 import json
-from google import genai
-from google.genai import types
-import PIL.Image
+import base64
+import hashlib
+import hmac
+import threading
 from datetime import datetime
 import math
-import psycopg2
-from psycopg2.extras import RealDictCursor
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
@@ -27,8 +29,26 @@ from redis_cache import (
     set_cache, 
     delete_cache,
     cache_key,
+    user_cache_key,
+    cached,
+    cached_many,
     invalidate_user_cache,
-    get_cache_stats
+    get_cache_stats,
+    get_client_cache_stats,
+    render_metrics as render_cache_metrics
+)
+from generation_jobs import submit_job, get_job, wait_for_job, generation_error_message, JobQueueFull
+from prompt_templates import render_prompt
+from image_prep import prepare_image, init_image_cache, get_image_prep_stats
+from gemini_clients import (
+    get_client as get_gemini_client, evict_client as evict_gemini_client,
+    get_client_stats as get_gemini_client_stats, inline_part as gemini_inline_part
+)
+from login_limiter import LoginAttempt, client_ip, reset_email_failures, TRUSTED_PROXY_HOPS
+from password_hashing import (
+    init_password_hashing, hash_password, check_password, rehash_if_needed,
+    get_password_hashing_stats, PasswordHashingBusy, LOG_ROUNDS as BCRYPT_LOG_ROUNDS,
+    RETRY_AFTER as PASSWORD_RETRY_AFTER
 )
 
 # Myanmar timezone (UTC+6:30)
@@ -82,7 +102,61 @@ def add_facebook_trademark(content):
     
     return result
 
+
+class FacebookTrademarkStream:
+    """Apply add_facebook_trademark to text that arrives in chunks.
+
+    A chunk can end in the middle of 'Facebook' (or right after it, before we
+    know whether a ™ follows), so that tail is held back until the next chunk
+    or finish().
+    """
+    
+    _WORD = 'facebook'
+    
+    def __init__(self):
+        self._pending = ''
+    
+    def _safe_length(self):
+        """Length of the pending prefix whose trademark processing is final."""
+        lowered = self._pending.lower()
+        trailing = re.search(r'facebook\s*$', lowered)
+        if trailing:
+            return trailing.start()
+        for size in range(len(self._WORD) - 1, 0, -1):
+            if lowered.endswith(self._WORD[:size]):
+                return len(lowered) - size
+        return len(lowered)
+    
+    def feed(self, text):
+        """Add a chunk and return the processed text that is safe to emit."""
+        self._pending += text
+        cut = self._safe_length()
+        ready, self._pending = self._pending[:cut], self._pending[cut:]
+        return add_facebook_trademark(ready)
+    
+    def finish(self):
+        """Flush whatever is still held back at the end of the stream."""
+        ready, self._pending = self._pending, ''
+        return add_facebook_trademark(ready)
+
+
+class InMemoryUploadRequest(Request):
+    """Request that keeps file uploads in memory instead of spooling them to disk.
+
+    Werkzeug writes any upload in a body over 500 KB to a temporary file. The
+    body is capped at MAX_CONTENT_LENGTH (larger ones get a 413 before they are
+    parsed), so a BytesIO holds at most that much per request.
+    """
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        return io.BytesIO()
+
+
 app = Flask(__name__)
+app.request_class = InMemoryUploadRequest
+if TRUSTED_PROXY_HOPS:
+    # Take the client address from X-Forwarded-For, trusting only our own proxies
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=TRUSTED_PROXY_HOPS)
 project_folder = os.path.dirname(os.path.abspath(__file__))
 
 # Configure for PostgreSQL
@@ -122,12 +196,20 @@ except OSError:
     pass
 
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
+
+# Prepared (resized/re-encoded) uploads are cached by content hash under the upload folder
+init_image_cache(os.path.join(UPLOAD_FOLDER, 'image_cache'))
 app.config["SECRET_KEY"] = os.getenv("FLASK_SECRET_KEY", "a-very-secret-key-for-development")
 app.config["SQLALCHEMY_DATABASE_URI"] = DATABASE_URL
 app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
 app.config['WTF_CSRF_ENABLED'] = True
 app.config['FAVICON_VERSION'] = '3.0'  # Increment this to force favicon refresh
 app.config['MAX_CONTENT_LENGTH'] = 10 * 1024 * 1024  # 10 MB limit
+# Opt-in cache of generated posts for identical form resubmissions (seconds, 0 = off)
+app.config['GENERATION_CACHE_TTL'] = int(os.getenv('GENERATION_CACHE_TTL', '0'))
+
+# Voice recordings are sent inline to Gemini, so keep them well under the request cap
+MAX_AUDIO_UPLOAD_BYTES = int(os.getenv('MAX_AUDIO_UPLOAD_BYTES', str(8 * 1024 * 1024)))
 
 # Session configuration for remember me functionality
 app.config['SESSION_COOKIE_SECURE'] = False  # Set to True in production with HTTPS
@@ -155,7 +237,10 @@ app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
 init_redis()
 
 db = SQLAlchemy(app)
+# Cost factor per environment (e.g. lower on preview deploys); see password_hashing.py
+app.config['BCRYPT_LOG_ROUNDS'] = BCRYPT_LOG_ROUNDS
 bcrypt = Bcrypt(app)
+init_password_hashing(bcrypt)
 
 from flask_compress import Compress
 Compress(app)
@@ -181,7 +266,13 @@ class User(UserMixin, db.Model):
     subscription_start = db.Column(db.DateTime, nullable=True)  # Subscription start date
     user_type = db.Column(db.String(20), default='trial', nullable=True)  # 'trial' or 'normal' - nullable for backward compatibility
     subscription_duration = db.Column(db.String(20), nullable=True)  # '1day', '7days', '1month', '3months', '6months', '1year'
+    # Denormalized content counters, kept in step by save/delete/toggle (see reconcile_content_counters)
+    total_contents = db.Column(db.Integer, default=0, server_default='0', nullable=False)
+    published_contents = db.Column(db.Integer, default=0, server_default='0', nullable=False)
+    last_content_at = db.Column(db.DateTime, nullable=True)
     contents = db.relationship('Content', backref='author', lazy=True, cascade='all, delete-orphan')
+    # The email search index (gin_trgm_ops) needs pg_trgm, so it is built by
+    # scripts/create_indexes.py rather than declared here
     
     def is_account_locked(self):
         """Check if account is currently locked"""
@@ -198,27 +289,25 @@ class User(UserMixin, db.Model):
             return locked_until_myanmar > current_time
         return False
     
-    def record_failed_login(self):
-        """Record a failed login attempt"""
-        self.failed_login_attempts += 1
-        self.last_failed_login = datetime.now(timezone.utc)
+    def lock_after_failed_logins(self, attempts):
+        """Deactivate and lock the account once the login limiter hits the limit.
         
-        # Lock account after 3 failed attempts
-        if self.failed_login_attempts >= 3:
-            self.is_active = False
-            # Set lock time in UTC but calculate 30 minutes from Myanmar time
-            myanmar_now = get_myanmar_time()
-            myanmar_lock_until = myanmar_now + timedelta(minutes=30)
-            self.locked_until = myanmar_lock_until.astimezone(timezone.utc).replace(tzinfo=None)
-        
-        db.session.commit()
+        Failed attempts are counted in Redis (login_limiter); the row is only
+        written here, when a lock triggers. The caller commits.
+        """
+        self.failed_login_attempts = attempts
+        self.last_failed_login = datetime.now(timezone.utc)
+        self.is_active = False
+        # Set lock time in UTC but calculate 30 minutes from Myanmar time
+        myanmar_now = get_myanmar_time()
+        myanmar_lock_until = myanmar_now + timedelta(minutes=30)
+        self.locked_until = myanmar_lock_until.astimezone(timezone.utc).replace(tzinfo=None)
     
     def reset_failed_attempts(self):
-        """Reset failed login attempts after successful login"""
+        """Clear lock state written by lock_after_failed_logins (the caller commits)"""
         self.failed_login_attempts = 0
         self.last_failed_login = None
         self.locked_until = None
-        db.session.commit()
     
     def get_locked_until_myanmar(self):
         """Get locked_until time in Myanmar timezone for display"""
@@ -342,27 +431,118 @@ class Content(db.Model):
     published = db.Column(db.Boolean, default=False, nullable=False)
     created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
     updated_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc), onupdate=lambda: datetime.now(timezone.utc))
+    
+    __table_args__ = (
+        # Per-user listings: recent contents, dashboard pages and counts
+        db.Index('ix_content_user_id_created_at', user_id, created_at.desc()),
+        # Published/draft counts and filtered listings, already in display order
+        db.Index('ix_content_user_id_published_created_at', user_id, published, created_at.desc()),
+        # Latest contents across all users (admin dashboard)
+        db.Index('ix_content_created_at', created_at.desc()),
+    )
 
-@login_manager.user_loader
-def load_user(user_id):
+# Session snapshot: a compact copy of the user row in L1/Redis so read-only
+# endpoints (polled JSON, dashboards) skip the Postgres lookup in load_user.
+# The API key and password hash are never part of it.
+SNAPSHOT_FIELDS = (
+    'id', 'email', 'is_admin', 'is_active', 'user_type', 'content_count', 'image_credits',
+    'total_contents', 'published_contents', 'created_at', 'expires_at', 'subscription_start',
+    'subscription_duration', 'last_content_at'
+)
+SNAPSHOT_DATETIME_FIELDS = ('created_at', 'expires_at', 'subscription_start', 'last_content_at')
+SNAPSHOT_TTL = 300  # seconds
+# GET endpoints that only read current_user and may be served from the snapshot
+# (user_dashboard renders the API key, so it always loads the row)
+SNAPSHOT_ENDPOINTS = {
+    'session_status', 'generation_job_status', 'get_content_api', 'list_contents_api',
+    'voice_generator', 'image_generator', 'contents_dashboard'
+}
+
+class UserSnapshot(UserMixin):
+    """Read-only stand-in for User built from a cached snapshot
+    
+    Attributes outside the snapshot (api_key, contents, ...) load the full
+    row on first access, so templates keep working; nothing may be written.
+    """
+    is_active = True  # shadows UserMixin's property; set per instance below
+    
+    def __init__(self, data):
+        for field in SNAPSHOT_FIELDS:
+            value = data.get(field)
+            if field in SNAPSHOT_DATETIME_FIELDS and value:
+                value = datetime.fromisoformat(value)
+            object.__setattr__(self, field, value)
+        object.__setattr__(self, '_user', None)
+    
+    def __getattr__(self, name):
+        if name.startswith('__'):
+            raise AttributeError(name)
+        if self._user is None:
+            logging.debug(f"Hydrating user {self.id} for attribute {name}")
+            object.__setattr__(self, '_user', db.session.get(User, self.id))
+        return getattr(self._user, name)
+    
+    def __setattr__(self, name, value):
+        raise AttributeError(f"UserSnapshot is read-only (tried to set {name})")
+    
+    # Pure checks over snapshot fields, shared with the model
+    is_account_expired = User.is_account_expired
+    can_generate_content = User.can_generate_content
+    get_remaining_content_count = User.get_remaining_content_count
+    get_remaining_content_count_json = User.get_remaining_content_count_json
+
+def _user_snapshot_key(user_id):
+    # Versioned per user, so content writes (invalidate_user_cache) drop it too
+    return user_cache_key('session', user_id)
+
+def _build_user_snapshot(user):
+    data = {}
+    for field in SNAPSHOT_FIELDS:
+        value = getattr(user, field)
+        if field in SNAPSHOT_DATETIME_FIELDS and value:
+            value = value.isoformat()
+        data[field] = value
+    return data
+
+def invalidate_user_snapshot(user_id):
+    """Drop a user's session snapshot after their row changed"""
+    delete_cache(_user_snapshot_key(user_id))
+
+def _load_user_row(user_id):
+    """Load the full User row, retrying once after a connection error"""
     try:
-        user = db.session.get(User, int(user_id))
+        user = db.session.get(User, user_id)
         if user:
-            logging.debug(f"Loaded user {user.email} (id: {user_id}, type: {user.user_type}, api_key: {'SET' if user.api_key else 'NOT SET'})")
+            logging.debug("Loaded user %s (id: %s, type: %s)", user.email, user_id, user.user_type)
         return user
     except Exception as e:
         logging.error(f"Error loading user {user_id}: {e}")
         # Try to rollback and retry once
         try:
             db.session.rollback()
-            user = db.session.get(User, int(user_id))
+            user = db.session.get(User, user_id)
             if user:
-                logging.info(f"Retry successful - loaded user {user.email} (api_key: {'SET' if user.api_key else 'NOT SET'})")
+                logging.info(f"Retry successful - loaded user {user.email}")
             return user
         except Exception as retry_error:
             logging.error(f"Retry failed for user {user_id}: {retry_error}")
             return None
 
+@login_manager.user_loader
+def load_user(user_id):
+    user_id = int(user_id)
+    if request.method != 'GET' or request.endpoint not in SNAPSHOT_ENDPOINTS:
+        return _load_user_row(user_id)
+    
+    snapshot = get_cache(_user_snapshot_key(user_id))
+    if snapshot:
+        return UserSnapshot(snapshot)
+    
+    user = _load_user_row(user_id)
+    if user:
+        set_cache(_user_snapshot_key(user_id), _build_user_snapshot(user), expire=SNAPSHOT_TTL)
+    return user
+
 # Custom validator for Gmail addresses
 def validate_gmail(form, field):
     if not field.data.lower().endswith('@gmail.com'):
@@ -437,18 +617,31 @@ def inject_now():
         'myanmar_now': get_myanmar_time()
     }
 
-# Configure Google Gemini API
-GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
-if GEMINI_API_KEY:
-    client = genai.Client(api_key=GEMINI_API_KEY)
-    logging.info("Gemini API configured successfully")
-else:
-    logging.warning("GEMINI_API_KEY not found in environment variables")
-    client = None
+# Gemini clients are built per user API key on first use (see gemini_clients.py)
+# Model used for all social post generation
+GEMINI_TEXT_MODEL = 'gemini-2.5-flash'
 
 # Global error handlers
 from werkzeug.exceptions import HTTPException
 
+# Pages that take a password, so a shed request can re-render its form
+PASSWORD_FORM_PAGES = {
+    'login': ('login.html', LoginForm),
+    'admin_login': ('admin_login.html', AdminLoginForm),
+    'create_user': ('create_user.html', UserForm),
+}
+
+@app.errorhandler(PasswordHashingBusy)
+def handle_password_hashing_busy(e):
+    """Fail fast with 429 when the password hashing queue is full"""
+    headers = {'Retry-After': str(PASSWORD_RETRY_AFTER)}
+    page = PASSWORD_FORM_PAGES.get(request.endpoint)
+    if request.is_json or not page:
+        return jsonify({'error': str(e)}), 429, headers
+    template, form_class = page
+    flash(str(e), 'error')
+    return render_template(template, form=form_class()), 429, headers
+
 @app.errorhandler(Exception)
 def handle_exception(e):
     """Handle uncaught exceptions"""
@@ -500,6 +693,12 @@ def login():
     
     form = LoginForm()
     if form.validate_on_submit():
+        # Throttle brute force before touching the database or bcrypt
+        attempt = LoginAttempt(form.email.data, client_ip(request))
+        if attempt.blocked():
+            flash('Too many failed login attempts. Please try again later.', 'error')
+            return redirect(url_for('login', login_error='true', message='Too many failed login attempts. Please try again later'))
+        
         user = User.query.filter_by(email=form.email.data.lower()).first()
         
         if user:
@@ -526,7 +725,8 @@ def login():
                     return redirect(url_for('login', login_error='true', message=error_message))
             
             # Check password
-            if bcrypt.check_password_hash(user.password_hash, form.password.data):
+            if check_password(user.password_hash, form.password.data):
+                attempt.record_success()
                 # Redirect admins to admin login
                 if user.is_admin:
                     flash('Please use admin login for administrative access.', 'info')
@@ -538,9 +738,14 @@ def login():
                     flash('API key is required for regular users', 'error')
                     return redirect(url_for('login', login_error='true', message='API key is required for regular users'))
                 
-                # Store API key
+                # Store API key (and upgrade the hash if the cost factor changed)
+                previous_api_key = user.api_key
                 user.api_key = form.api_key.data
+                rehash_if_needed(user, form.password.data)
                 db.session.commit()
+                invalidate_user_snapshot(user.id)
+                if previous_api_key and previous_api_key != user.api_key:
+                    evict_gemini_client(previous_api_key)
                 
                 # Explicitly refresh the user object to ensure api_key is loaded
                 db.session.refresh(user)
@@ -553,10 +758,12 @@ def login():
                 # Add URL parameter for toast notification
                 return redirect(url_for('index', login_success='true', username=user.email))
             else:
-                # Failed password - just show error message
+                # Failed password - count it and show error message
+                attempt.record_failure()
                 flash('Invalid email or password', 'error')
                 return redirect(url_for('login', login_error='true', message='Invalid email or password'))
         else:
+            attempt.record_failure()
             flash('Invalid email or password', 'error')
             return redirect(url_for('login', login_error='true', message='Invalid email or password'))
     
@@ -574,6 +781,12 @@ def admin_login():
     form = AdminLoginForm()
     
     if form.validate_on_submit():
+        # Throttle brute force before touching the database or bcrypt
+        attempt = LoginAttempt(form.email.data, client_ip(request))
+        if attempt.blocked():
+            flash('Too many failed login attempts. Please try again later.', 'error')
+            return redirect(url_for('admin_login', login_error='true', message='Too many failed login attempts. Please try again later'))
+        
         user = User.query.filter_by(email=form.email.data.lower()).first()
         
         if user:
@@ -598,26 +811,35 @@ def admin_login():
                 return redirect(url_for('admin_login', login_error='true', message='Access denied. Admin privileges required'))
             
             # Check password
-            if bcrypt.check_password_hash(user.password_hash, form.password.data):
-                # Successful login - reset failed attempts
-                user.reset_failed_attempts()
-                db.session.commit()
+            if check_password(user.password_hash, form.password.data):
+                # Successful login - reset failed attempts; the row is only
+                # written if it still carries lock state or an outdated hash
+                attempt.record_success()
+                needs_write = bool(user.failed_login_attempts or user.locked_until)
+                if needs_write:
+                    user.reset_failed_attempts()
+                if rehash_if_needed(user, form.password.data) or needs_write:
+                    db.session.commit()
                 
                 login_user(user, remember=True)
                 flash(f'Welcome back, Admin {user.email}!', 'success')
                 return redirect(url_for('admin_dashboard', login_success='true', username=user.email))
             else:
-                # Failed password - record attempt
-                user.record_failed_login()
-                remaining_attempts = 3 - user.failed_login_attempts
+                # Failed password - count it in the limiter; only a lock hits the database
+                failed_attempts = attempt.record_failure()
+                remaining_attempts = 3 - failed_attempts
                 
-                if user.failed_login_attempts >= 3:
+                if failed_attempts >= 3:
+                    user.lock_after_failed_logins(failed_attempts)
+                    db.session.commit()
+                    invalidate_user_snapshot(user.id)
                     flash('Account deactivated due to 3 failed login attempts. Please contact an administrator.', 'error')
                     return redirect(url_for('admin_login', login_error='true', message='Account deactivated due to 3 failed login attempts'))
                 else:
                     flash(f'Invalid password. {remaining_attempts} attempts remaining before account deactivation.', 'error')
                     return redirect(url_for('admin_login', login_error='true', message=f'Invalid password. {remaining_attempts} attempts remaining'))
         else:
+            attempt.record_failure()
             flash('Invalid email or password', 'error')
             return redirect(url_for('admin_login', login_error='true', message='Invalid email or password'))
     
@@ -635,6 +857,54 @@ def logout():
         return redirect(url_for('admin_login', logout_success='true', username=user_email))
     return redirect(url_for('login', logout_success='true', username=user_email))
 
+# Admin dashboard statistics snapshot. Served from cache; once older than
+# ADMIN_STATS_REFRESH it is recomputed in a background thread while readers
+# keep getting the previous snapshot. Writes that change the numbers drop it,
+# and `cached` makes concurrent misses wait for a single recompute.
+ADMIN_STATS_KEY = cache_key('admin_dashboard', 'stats')
+ADMIN_STATS_REFRESH = 60  # seconds before a background refresh
+ADMIN_STATS_TTL = 600  # seconds a snapshot may be served at most
+
+@cached('admin_dashboard', expire=ADMIN_STATS_TTL, key_func=lambda: ADMIN_STATS_KEY, stale_ttl=0, beta=0)
+def _load_admin_stats():
+    """Count users/contents and load the latest contents for the admin dashboard"""
+    recent_contents = Content.query.order_by(Content.created_at.desc()).limit(3).all()
+    return {
+        'total_users': User.query.count(),
+        'total_contents': Content.query.count(),
+        'recent_contents': [{
+            'id': c.id,
+            'user_id': c.user_id,
+            'title': c.title,
+            'published': c.published,
+            'created_at': c.created_at.isoformat() if c.created_at else None
+        } for c in recent_contents],
+        'computed_at': time.time()
+    }
+
+def _refresh_admin_stats_in_background():
+    """Recompute the snapshot off the request thread"""
+    def run():
+        try:
+            with app.app_context():
+                # Skipped when another worker is already refreshing it
+                _load_admin_stats.refresh()
+        except Exception as e:
+            logging.error(f"Admin stats refresh failed: {e}")
+    
+    threading.Thread(target=run, name='admin-stats-refresh', daemon=True).start()
+
+def get_admin_stats():
+    """Get total_users, total_contents and recent_contents for the admin dashboard"""
+    stats = _load_admin_stats()
+    if time.time() - stats.get('computed_at', 0) > ADMIN_STATS_REFRESH:
+        _refresh_admin_stats_in_background()
+    return stats
+
+def invalidate_admin_stats():
+    """Drop the admin statistics snapshot after users or contents change"""
+    delete_cache(ADMIN_STATS_KEY)
+
 @app.route('/admin')
 @login_required
 @handle_db_errors
@@ -648,17 +918,6 @@ def admin_dashboard():
     search = request.args.get('search', '', type=str)
     filter_status = request.args.get('filter', '', type=str)
     
-    # Only cache for default view (no search/filter, first page)
-    if not search and not filter_status and page == 1:
-        cache_key_str = cache_key('admin_dashboard')
-        cached_data = get_cache(cache_key_str)
-        
-        if cached_data:
-            logging.debug("Admin dashboard cache HIT")
-            # Note: Pagination objects are complex to cache/reconstruct
-            # We'll fetch fresh data but this shows the caching pattern
-            # For production, consider caching just the statistics
-    
     # Build query with search and filter
     query = User.query
     
@@ -674,25 +933,13 @@ def admin_dashboard():
         page=page, per_page=10, error_out=False
     )
     
-    total_users = User.query.count()
-    total_contents = Content.query.count()
-    recent_contents = Content.query.order_by(Content.created_at.desc()).limit(3).all()
-    
-    # Cache statistics for default view (2 minutes)
-    if not search and not filter_status and page == 1:
-        cached_data = {
-            'total_users': total_users,
-            'total_contents': total_contents,
-            'cached_at': datetime.now().isoformat()
-        }
-        set_cache(cache_key_str, cached_data, expire=120)
-        logging.debug("Admin dashboard stats cached")
+    stats = get_admin_stats()
     
     return render_template('admin_dashboard.html', 
                          users=users, 
-                         total_users=total_users,
-                         total_contents=total_contents,
-                         recent_contents=recent_contents,
+                         total_users=stats['total_users'],
+                         total_contents=stats['total_contents'],
+                         recent_contents=stats['recent_contents'],
                          search=search,
                          filter_status=filter_status)
 
@@ -712,7 +959,7 @@ def create_user():
             flash('Email already exists', 'error')
             return redirect(url_for('create_user', user_error='true', message='Email already exists'))
         else:
-            password_hash = bcrypt.generate_password_hash(form.password.data).decode('utf-8')
+            password_hash = hash_password(form.password.data)
             is_admin = False  # Always create non-admin users
             user_type = form.user_type.data
             image_credits_value = 20
@@ -868,6 +1115,7 @@ def create_user():
                 
                 db.session.add(user)
                 db.session.commit()
+                invalidate_admin_stats()
                 
                 logging.info(f"User {form.email.data} created successfully in database")
                 flash(f'User {form.email.data} created successfully', 'success')
@@ -899,6 +1147,10 @@ def toggle_user_status(user_id):
         old_status = user.is_active
         user.is_active = not user.is_active
         db.session.commit()
+        if user.is_active:
+            # A fresh start, so recent failures can't re-lock the account at once
+            reset_email_failures(user.email)
+        invalidate_user_snapshot(user.id)
         
         status = 'activated' if user.is_active else 'deactivated'
         print(f"User {user.email} (ID: {user_id}) {status} by admin {current_user.email}")
@@ -925,19 +1177,21 @@ def reset_user_attempts(user_id):
     
     try:
         old_attempts = user.failed_login_attempts
-        user.reset_failed_attempts()
-        
         # If user was deactivated due to failed attempts, reactivate them
-        if not user.is_active and user.locked_until:
+        was_locked = not user.is_active and user.locked_until is not None
+        user.reset_failed_attempts()
+        if was_locked:
             user.is_active = True
-            db.session.commit()
+        db.session.commit()
+        reset_email_failures(user.email)
+        invalidate_user_snapshot(user.id)
         
         print(f"Admin {current_user.email} reset failed attempts for user {user.email} (was: {old_attempts})")
         
         return jsonify({
             'success': True, 
             'message': f'Failed login attempts reset for {user.email}',
-            'was_reactivated': not user.is_active and user.locked_until is not None
+            'was_reactivated': was_locked
         })
     except Exception as e:
         db.session.rollback()
@@ -954,6 +1208,8 @@ def delete_user(user_id):
     if user and user.id != current_user.id:  # Can't delete self
         db.session.delete(user)
         db.session.commit()
+        invalidate_user_snapshot(user_id)
+        invalidate_admin_stats()
         return jsonify({'success': True, 'message': 'User deleted successfully'})
     
     return jsonify({'error': 'User not found or cannot delete self'}), 400
@@ -1041,7 +1297,7 @@ def edit_user(user_id):
                 return jsonify({'error': 'Password must be at least 6 characters'}), 400
             if ' ' in new_password:
                 return jsonify({'error': 'Password cannot contain spaces'}), 400
-            user.password_hash = bcrypt.generate_password_hash(new_password).decode('utf-8')
+            user.password_hash = hash_password(new_password)
 
         # Parse subscription_start first (needed for expiration date validation)
         subscription_start_for_validation = None
@@ -1212,6 +1468,7 @@ def edit_user(user_id):
                 return jsonify({'error': 'Invalid image credit value'}), 400
 
         db.session.commit()
+        invalidate_user_snapshot(user.id)
 
         return jsonify({
             'success': True,
@@ -1227,6 +1484,10 @@ def edit_user(user_id):
             }
         })
 
+    except PasswordHashingBusy:
+        # Answered with 429 by handle_password_hashing_busy
+        db.session.rollback()
+        raise
     except Exception as e:
         db.session.rollback()
         logging.error(f"Error updating user: {e}")
@@ -1243,14 +1504,113 @@ def admin_cache_stats():
     if stats:
         return jsonify({
             'success': True,
-            'stats': stats
+            'stats': stats,
+            'gemini_clients': get_gemini_client_stats(),
+            'image_prep': get_image_prep_stats(),
+            'password_hashing': get_password_hashing_stats()
         })
     else:
         return jsonify({
             'success': False,
-            'error': 'Cache not available or not configured'
+            'error': 'Cache not available or not configured',
+            'client': get_client_cache_stats(),
+            'gemini_clients': get_gemini_client_stats(),
+            'image_prep': get_image_prep_stats(),
+            'password_hashing': get_password_hashing_stats()
         })
 
+def _has_bearer_token(secret):
+    """True if secret is configured and the request sends it as a Bearer token"""
+    return bool(secret) and hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {secret}')
+
+@app.route('/admin/cache-metrics')
+def admin_cache_metrics():
+    """Per-prefix cache metrics in Prometheus text format
+    
+    Admins can open it in the browser; scrapers send
+    "Authorization: Bearer <CACHE_METRICS_TOKEN>" instead of logging in.
+    """
+    if not _has_bearer_token(os.getenv('CACHE_METRICS_TOKEN')) and not (current_user.is_authenticated and current_user.is_admin):
+        return Response('Access denied\n', status=403, mimetype='text/plain')
+    
+    return Response(render_cache_metrics(), mimetype='text/plain; version=0.0.4')
+
+def adjust_content_counters(user_id, total=0, published=0, last_content_at=None, recompute_last=False):
+    """Atomically adjust a user's content counters in the current transaction
+    
+    Uses UPDATE ... SET col = col + n so concurrent writes can't lose counts.
+    recompute_last re-reads the newest remaining content (after a delete).
+    """
+    values = {}
+    if total:
+        values['total_contents'] = User.total_contents + total
+    if published:
+        values['published_contents'] = User.published_contents + published
+    if last_content_at is not None:
+        values['last_content_at'] = last_content_at
+    elif recompute_last:
+        values['last_content_at'] = db.select(db.func.max(Content.created_at)).where(
+            Content.user_id == user_id).scalar_subquery()
+    if values:
+        db.session.execute(db.update(User).where(User.id == user_id).values(**values))
+
+def reconcile_content_counters(user_id=None):
+    """Recompute content counters from the content table where they drifted
+    
+    Returns the ids of the users whose counters were repaired; their cached
+    session snapshots are invalidated so the fixed counts are served.
+    """
+    total = db.select(db.func.count(Content.id)).where(Content.user_id == User.id).scalar_subquery()
+    published = db.select(db.func.count(Content.id)).where(
+        Content.user_id == User.id, Content.published == True).scalar_subquery()
+    last = db.select(db.func.max(Content.created_at)).where(Content.user_id == User.id).scalar_subquery()
+    
+    statement = db.update(User).where(db.or_(
+        User.total_contents != total,
+        User.published_contents != published,
+        User.last_content_at.is_distinct_from(last)
+    )).values(total_contents=total, published_contents=published, last_content_at=last)
+    if user_id is not None:
+        statement = statement.where(User.id == user_id)
+    
+    repaired = db.session.execute(
+        statement.returning(User.id).execution_options(synchronize_session=False)
+    ).scalars().all()
+    db.session.commit()
+    for repaired_id in repaired:
+        invalidate_user_snapshot(repaired_id)
+    if repaired:
+        logging.info(f"Reconciled content counters for {len(repaired)} users")
+    return repaired
+
+def get_user_content_stats(user):
+    """Total/published/drafts counts from the user's maintained counters"""
+    total = user.total_contents or 0
+    published = user.published_contents or 0
+    return {'total': total, 'published': published, 'drafts': max(0, total - published)}
+
+@cached_many(expire=300)
+def _load_user_page_data(names, user_id):
+    """Load per-user page values (recent contents) that missed the cache"""
+    values = {}
+    if 'recent_contents' in names:
+        recent = Content.query.filter_by(user_id=user_id).order_by(Content.created_at.desc()).limit(3).all()
+        values['recent_contents'] = [{
+            'id': c.id,
+            'title': c.title,
+            'published': c.published,
+            'created_at': c.created_at.isoformat() if c.created_at else None
+        } for c in recent]
+    return values
+
+def get_sidebar_data(user):
+    """Recent contents (one cache round-trip) and content stats for the generator pages"""
+    data = _load_user_page_data({
+        'recent_contents': user_cache_key('dashboard', user.id, 'recent')
+    }, user.id)
+    data['content_stats'] = get_user_content_stats(user)
+    return data
+
 
 @app.route('/generator')
 @login_required
@@ -1261,12 +1621,11 @@ def user_dashboard():
         return redirect(url_for('admin_dashboard'))
     
     # Get recent contents for sidebar
-    recent_contents = Content.query.filter_by(user_id=current_user.id).order_by(Content.created_at.desc()).limit(3).all()
-    total_contents = Content.query.filter_by(user_id=current_user.id).count()
+    sidebar = get_sidebar_data(current_user)
     
     return render_template('user_dashboard.html', 
-                         recent_contents=recent_contents,
-                         total_contents=total_contents,
+                         recent_contents=sidebar['recent_contents'],
+                         total_contents=sidebar['content_stats']['total'],
                          current_user=current_user)
 
 @app.route('/voice-generator')
@@ -1281,12 +1640,11 @@ def voice_generator():
         flash('Voice Generator is only available for Normal Users. Please contact admin to upgrade your account.', 'error')
         return redirect(url_for('user_dashboard'))
     
-    recent_contents = Content.query.filter_by(user_id=current_user.id).order_by(Content.created_at.desc()).limit(3).all()
-    total_contents = Content.query.filter_by(user_id=current_user.id).count()
+    sidebar = get_sidebar_data(current_user)
     
     return render_template('voice_generator.html', 
-                         recent_contents=recent_contents,
-                         total_contents=total_contents,
+                         recent_contents=sidebar['recent_contents'],
+                         total_contents=sidebar['content_stats']['total'],
                          current_user=current_user)
 
 @app.route('/image-generator')
@@ -1302,18 +1660,18 @@ def image_generator():
         flash('Image Generator is only available for Normal Users. Please contact admin to upgrade your account.', 'error')
         return redirect(url_for('user_dashboard'))
     
-    recent_contents = Content.query.filter_by(user_id=current_user.id).order_by(Content.created_at.desc()).limit(3).all()
-    total_contents = Content.query.filter_by(user_id=current_user.id).count()
+    sidebar = get_sidebar_data(current_user)
     
     return render_template('image_generator.html', 
-                         recent_contents=recent_contents,
-                         total_contents=total_contents,
+                         recent_contents=sidebar['recent_contents'],
+                         total_contents=sidebar['content_stats']['total'],
                          current_user=current_user)
 
 @app.route('/api/generate-image', methods=['POST'])
 @login_required
 def generate_image_api():
     """API endpoint for image generation"""
+    remaining_credits = None
     try:
         # Check if account has expired
         if current_user.is_account_expired():
@@ -1350,12 +1708,13 @@ def generate_image_api():
             quantity_value = 1
 
         if current_user.user_type == 'normal':
-            current_credits = current_user.image_credits or 0
-            if current_credits < quantity_value:
+            remaining_credits = reserve_image_credits(current_user.id, quantity_value)
+            if remaining_credits is None:
                 return jsonify({
                     'error': 'Not enough image credits. Please contact admin.',
-                    'remaining_credits': current_credits
+                    'remaining_credits': current_user.image_credits or 0
                 }), 403
+            set_committed_value(current_user, 'image_credits', remaining_credits)
         extra_directions = request.form.get('extra_directions', '')
         
         # Log the image generation request
@@ -1363,20 +1722,18 @@ def generate_image_api():
         logging.info(f"Style: {style}, Palette: {palette_theme}, Quantity: {quantity}")
         
         # TODO: Integrate with actual image generation API (e.g., DALL-E, Midjourney, or custom model)
-        # For now, return a placeholder response
-        if current_user.user_type == 'normal':
-            current_user.image_credits = max((current_user.image_credits or 0) - quantity_value, 0)
-            db.session.commit()
-
+        # For now, return a placeholder response (credits were reserved above)
         return jsonify({
             'success': True,
             'message': 'Image generation API is not yet configured. Please set up an image generation service.',
             'images': [],
-            'remaining_credits': current_user.image_credits if current_user.user_type == 'normal' else None
+            'remaining_credits': remaining_credits
         })
         
     except Exception as e:
         logging.error(f"Error generating image: {e}")
+        if remaining_credits is not None:
+            refund_image_credits(current_user.id, quantity_value)
         return jsonify({'error': str(e)}), 500
 
 @app.route('/contents/save', methods=['POST'])
@@ -1408,13 +1765,16 @@ def save_content():
             keywords=keywords,
             hashtags=hashtags,
             cta=cta,
-            negative_constraints=negative_constraints
+            negative_constraints=negative_constraints,
+            created_at=datetime.now(timezone.utc)
         )
         db.session.add(content)
+        adjust_content_counters(current_user.id, total=1, last_content_at=content.created_at)
         db.session.commit()
         
         # Invalidate user's dashboard cache
         invalidate_user_cache(current_user.id)
+        invalidate_admin_stats()
         logging.info(f"Cache invalidated for user {current_user.id} after saving content")
         
         # Return content data for frontend update
@@ -1449,10 +1809,14 @@ def delete_content(content_id):
             pass
     
     db.session.delete(content)
+    db.session.flush()
+    adjust_content_counters(current_user.id, total=-1, published=-1 if content.published else 0,
+                            recompute_last=True)
     db.session.commit()
     
     # Invalidate user's cache
     invalidate_user_cache(current_user.id)
+    invalidate_admin_stats()
     logging.info(f"Cache invalidated for user {current_user.id} after deleting content")
     
     return jsonify({'success': True, 'message': 'Content deleted successfully'})
@@ -1468,14 +1832,39 @@ def contents_dashboard():
     page = request.args.get('page', 1, type=int)
     per_page = 10
     contents_query = Content.query.filter_by(user_id=current_user.id).order_by(Content.created_at.desc())
-    total_count = contents_query.count()
+    stats = get_user_content_stats(current_user)
+    total_count = stats['total']
     total_pages = max(1, math.ceil(total_count / per_page))
+    published_count = stats['published']
+    drafts_count = stats['drafts']
+    
+    # Large libraries page by cursor so deep pages cost the same as the first;
+    # explicit ?page= links keep working with offsets
+    cursor = request.args.get('cursor')
+    cursor_mode = cursor is not None or ('page' not in request.args and total_count > KEYSET_MIN_ROWS)
+    if cursor_mode:
+        direction = request.args.get('direction', 'next')
+        contents, next_cursor, prev_cursor = fetch_contents_page(current_user.id, per_page, cursor, direction)
+        return render_template(
+            'contents_dashboard.html',
+            contents=contents,
+            total_count=total_count,
+            published_count=published_count,
+            drafts_count=drafts_count,
+            cursor_mode=True,
+            next_cursor=next_cursor,
+            prev_cursor=prev_cursor,
+            page=1,
+            per_page=per_page,
+            total_pages=total_pages,
+            current_page_count=len(contents),
+            format_datetime_iso=format_datetime_iso
+        )
+    
     # Clamp page within valid range
     page = max(1, min(page, total_pages))
     offset = (page - 1) * per_page
     contents = contents_query.offset(offset).limit(per_page).all()
-    published_count = contents_query.filter_by(published=True).count()
-    drafts_count = total_count - published_count
     page_numbers = _build_page_numbers(page, total_pages)
     
     return render_template(
@@ -1484,6 +1873,7 @@ def contents_dashboard():
         total_count=total_count,
         published_count=published_count,
         drafts_count=drafts_count,
+        cursor_mode=False,
         page=page,
         per_page=per_page,
         total_pages=total_pages,
@@ -1497,6 +1887,85 @@ def contents_dashboard():
     )
 
 
+# Keyset pagination on (created_at, id), newest first
+KEYSET_MIN_ROWS = 200  # libraries larger than this page by cursor
+
+def encode_cursor(content):
+    """Opaque cursor pointing at a content row's (created_at, id)"""
+    raw = json.dumps([content.created_at.isoformat(), content.id]).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+def decode_cursor(token):
+    """Decode a cursor from encode_cursor; None if missing or malformed"""
+    if not token:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        created_at, content_id = json.loads(raw)
+        return datetime.fromisoformat(created_at), int(content_id)
+    except (ValueError, TypeError):
+        return None
+
+def fetch_contents_page(user_id, per_page, cursor=None, direction='next'):
+    """Fetch one page of a user's contents after (older) or before (newer) a cursor
+    
+    Returns (contents, next_cursor, prev_cursor); a cursor is None when there
+    is nothing further in that direction.
+    """
+    position = decode_cursor(cursor)
+    query = Content.query.filter_by(user_id=user_id)
+    newer = direction == 'prev' and position is not None
+    
+    if position:
+        key = db.tuple_(Content.created_at, Content.id)
+        query = query.filter(key > position if newer else key < position)
+    if newer:
+        query = query.order_by(Content.created_at.asc(), Content.id.asc())
+    else:
+        query = query.order_by(Content.created_at.desc(), Content.id.desc())
+    
+    # One extra row tells us whether another page exists
+    rows = query.limit(per_page + 1).all()
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+    if newer:
+        rows.reverse()
+    
+    if not rows:
+        return rows, None, None
+    if newer:
+        has_older, has_newer = True, has_more
+    else:
+        has_older, has_newer = has_more, position is not None
+    return (rows,
+            encode_cursor(rows[-1]) if has_older else None,
+            encode_cursor(rows[0]) if has_newer else None)
+
+@app.route('/api/contents', methods=['GET'])
+@login_required
+def list_contents_api():
+    """List the user's contents newest first, paginated by cursor"""
+    per_page = max(1, min(request.args.get('per_page', 20, type=int), 100))
+    cursor = request.args.get('cursor')
+    if cursor and decode_cursor(cursor) is None:
+        return jsonify({'success': False, 'error': 'Invalid cursor'}), 400
+    
+    contents, next_cursor, prev_cursor = fetch_contents_page(
+        current_user.id, per_page, cursor, request.args.get('direction', 'next'))
+    return jsonify({
+        'success': True,
+        'contents': [{
+            'id': content.id,
+            'title': content.title,
+            'content': content.content,
+            'published': content.published,
+            'created_at': format_datetime_iso(content.created_at),
+            'updated_at': format_datetime_iso(content.updated_at)
+        } for content in contents],
+        'next_cursor': next_cursor,
+        'prev_cursor': prev_cursor
+    })
+
 def _build_page_numbers(current_page, total_pages):
     if total_pages <= 5:
         return list(range(1, total_pages + 1))
@@ -1527,7 +1996,10 @@ def toggle_publish_status(content_id):
         new_status = data.get('published', False)
         
         # Update the published status
-        content.published = new_status
+        was_published = content.published
+        content.published = bool(new_status)
+        if content.published != was_published:
+            adjust_content_counters(current_user.id, published=1 if content.published else -1)
         db.session.commit()
         
         # Invalidate user's cache
@@ -1624,8 +2096,14 @@ def update_api_key():
         if not user:
             return jsonify({'success': False, 'error': 'User not found.'}), 404
 
+        previous_api_key = user.api_key
         user.api_key = api_key
         db.session.commit()
+        invalidate_user_snapshot(user.id)
+
+        # Drop the pooled client for the old key so it can't be reused
+        if previous_api_key and previous_api_key != api_key:
+            evict_gemini_client(previous_api_key)
 
         logging.info(f"User {user.email} updated their API key")
         return jsonify({'success': True})
@@ -1635,531 +2113,537 @@ def update_api_key():
         return jsonify({'success': False, 'error': 'Failed to update API key.'}), 500
 
 
-@app.route('/generate-content', methods=['POST'])
-@login_required
-def generate_content():
-    try:
-        logging.info("Generate content request received")
-        
-        # Check if account has expired - block content generation only
-        # Debug: Log expiration details
-        current_utc = datetime.now(timezone.utc)
-        user_expires_utc = current_user.expires_at.replace(tzinfo=timezone.utc) if current_user.expires_at and current_user.expires_at.tzinfo is None else current_user.expires_at
-        
-        logging.info(f"=== Expiration Check for {current_user.email} ===")
-        logging.info(f"User expires_at (UTC): {user_expires_utc}")
-        logging.info(f"Current time (UTC): {current_utc}")
-        if user_expires_utc:
-            myanmar_expires = user_expires_utc.astimezone(MYANMAR_TZ)
-            myanmar_now = current_utc.astimezone(MYANMAR_TZ)
-            logging.info(f"User expires_at (Myanmar): {myanmar_expires}")
-            logging.info(f"Current time (Myanmar): {myanmar_now}")
-            logging.info(f"Is expired: {user_expires_utc <= current_utc}")
-        
-        if current_user.is_account_expired():
-            logging.info(f"❌ Content generation BLOCKED for expired user: {current_user.email}")
-            # Different messages for trial vs normal users
-            if current_user.user_type == 'trial':
-                error_message = 'Your trial period has ended. Please contact admin for renewal.'
-            else:
-                error_message = 'Your subscription period has ended. Please contact admin for renewal.'
-            return jsonify({'error': error_message}), 403
+def _prepare_generation():
+    """Validate the generation form and build the Gemini request.
+
+    Shared by the blocking and streaming generate endpoints. Returns
+    ``(generation, None)`` where ``generation`` holds the user's client and the
+    request contents, or ``(None, error_response)`` if the request is rejected.
+    """
+    logging.info("Generate content request received")
+    
+    # Check if account has expired - block content generation only
+    # Debug: Log expiration details
+    current_utc = datetime.now(timezone.utc)
+    user_expires_utc = current_user.expires_at.replace(tzinfo=timezone.utc) if current_user.expires_at and current_user.expires_at.tzinfo is None else current_user.expires_at
+    
+    logging.info(f"=== Expiration Check for {current_user.email} ===")
+    logging.info(f"User expires_at (UTC): {user_expires_utc}")
+    logging.info(f"Current time (UTC): {current_utc}")
+    if user_expires_utc:
+        myanmar_expires = user_expires_utc.astimezone(MYANMAR_TZ)
+        myanmar_now = current_utc.astimezone(MYANMAR_TZ)
+        logging.info(f"User expires_at (Myanmar): {myanmar_expires}")
+        logging.info(f"Current time (Myanmar): {myanmar_now}")
+        logging.info(f"Is expired: {user_expires_utc <= current_utc}")
+    
+    if current_user.is_account_expired():
+        logging.info(f"❌ Content generation BLOCKED for expired user: {current_user.email}")
+        # Different messages for trial vs normal users
+        if current_user.user_type == 'trial':
+            error_message = 'Your trial period has ended. Please contact admin for renewal.'
         else:
-            logging.info(f"✅ Content generation ALLOWED for user: {current_user.email}")
-        
-        # Check content generation limit
-        if not current_user.can_generate_content():
-            logging.error(f"User {current_user.email} has reached content generation limit")
-            return jsonify({'error': "You've reached the maximum limit of generating contents for your trial plan. To continue using Genius AutoWriter without interruption, please upgrade your subscription."}), 403
-        
-        # Check if user has API key (required for content generation)
-        logging.info(f"Content generation request from user {current_user.email} (type: {current_user.user_type}, id: {current_user.id})")
-        logging.info(f"API key status: {'SET (length: ' + str(len(current_user.api_key)) + ')' if current_user.api_key else 'NOT SET'}")
-        
-        if not current_user.api_key:
-            # Try to reload user from database as a fallback
-            logging.warning(f"API key not found in session for user {current_user.id}, attempting database reload...")
-            try:
-                db_user = db.session.get(User, current_user.id)
-                if db_user and db_user.api_key:
-                    logging.info(f"API key found in database for user {current_user.email}, using it")
-                    api_key_to_use = db_user.api_key
-                else:
-                    logging.error(f"API key not found in database either for user {current_user.email}")
-                    if current_user.is_admin:
-                        return jsonify({'error': 'Admin users need to provide a Gemini API key to generate content. Please update your profile or login again with an API key.'}), 400
-                    else:
-                        return jsonify({'error': 'Please login with your Gemini API key to generate content.'}), 400
-            except Exception as reload_error:
-                logging.error(f"Error reloading user from database: {reload_error}")
+            error_message = 'Your subscription period has ended. Please contact admin for renewal.'
+        return None, (jsonify({'error': error_message}), 403)
+    else:
+        logging.info(f"✅ Content generation ALLOWED for user: {current_user.email}")
+    
+    # Check content generation limit
+    if not current_user.can_generate_content():
+        logging.error(f"User {current_user.email} has reached content generation limit")
+        return None, (jsonify({'error': "You've reached the maximum limit of generating contents for your trial plan. To continue using Genius AutoWriter without interruption, please upgrade your subscription."}), 403)
+    
+    # Check if user has API key (required for content generation)
+    logging.info(f"Content generation request from user {current_user.email} (type: {current_user.user_type}, id: {current_user.id})")
+    logging.info(f"API key status: {'SET (length: ' + str(len(current_user.api_key)) + ')' if current_user.api_key else 'NOT SET'}")
+    
+    if not current_user.api_key:
+        # Try to reload user from database as a fallback
+        logging.warning(f"API key not found in session for user {current_user.id}, attempting database reload...")
+        try:
+            db_user = db.session.get(User, current_user.id)
+            if db_user and db_user.api_key:
+                logging.info(f"API key found in database for user {current_user.email}, using it")
+                api_key_to_use = db_user.api_key
+            else:
+                logging.error(f"API key not found in database either for user {current_user.email}")
                 if current_user.is_admin:
-                    return jsonify({'error': 'Admin users need to provide a Gemini API key to generate content. Please update your profile or login again with an API key.'}), 400
+                    return None, (jsonify({'error': 'Admin users need to provide a Gemini API key to generate content. Please update your profile or login again with an API key.'}), 400)
                 else:
-                    return jsonify({'error': 'Please login with your Gemini API key to generate content.'}), 400
-        else:
-            api_key_to_use = current_user.api_key
+                    return None, (jsonify({'error': 'Please login with your Gemini API key to generate content.'}), 400)
+        except Exception as reload_error:
+            logging.error(f"Error reloading user from database: {reload_error}")
+            if current_user.is_admin:
+                return None, (jsonify({'error': 'Admin users need to provide a Gemini API key to generate content. Please update your profile or login again with an API key.'}), 400)
+            else:
+                return None, (jsonify({'error': 'Please login with your Gemini API key to generate content.'}), 400)
+    else:
+        api_key_to_use = current_user.api_key
+    
+    # Configure Gemini with user's API key
+    try:
+        user_client = get_gemini_client(api_key_to_use)
+        logging.info(f"User's Gemini API configured successfully using {'session' if current_user.api_key else 'database'} API key")
+    except Exception as api_error:
+        logging.error(f"Error configuring user's API key: {api_error}")
+        error_message = str(api_error)
+        if 'quota' in error_message.lower() or '429' in error_message:
+            return None, (jsonify({'error': 'Content generation is currently unavailable. Please try again later.'}), 503)
+        return None, (jsonify({'error': 'Invalid API key. Please check your Gemini API key.'}), 400)
+    # request.form is used for multipart/form-data
+    data = request.form
+    page_name = data.get('pageName', '')
+    prompt = data.get('prompt', '')
+    purpose = data.get('purpose', '')
+    
+    # Validate required fields
+    if not page_name.strip():
+        return None, (jsonify({'error': 'Page Name လိုအပ်ပါတယ်။ Facebook™️ Page သို့မဟုတ် Brand အမည် ထည့်ပါ။'}), 400)
+    
+    if not prompt.strip():
+        return None, (jsonify({'error': 'Topic လိုအပ်ပါတယ်။ Content ၏ အဓိက အကြောင်းအရာ ထည့်ပါ။'}), 400)
+    writing_style = data.get('writingStyle', '')
+    audience = data.get('audience', '')
+    word_count = data.get('wordCount', '')
+    keywords = data.get('keywords', '')
+    hashtags = data.get('hashtags', '')
+    cta = data.get('cta', '')
+    negative_constraints = data.get('negativeConstraints', '')
+    language = data.get('language', 'myanmar')
+    
+    
+    # Get emoji toggle state
+    include_emojis = data.get('includeEmojis', 'true').lower() == 'true'
+
+    # Render the prompt from the precompiled template registry
+    prompt_fields = dict(
+        page_name=page_name, prompt=prompt, purpose=purpose, writing_style=writing_style,
+        audience=audience, word_count=word_count, keywords=keywords, hashtags=hashtags,
+        cta=cta, negative_constraints=negative_constraints, language=language,
+        include_emojis=include_emojis
+    )
+    enhanced_prompt = render_prompt('text', **prompt_fields)
+    
+    # Check for uploaded files
+    image_file = request.files.get('image')
+    audio_file = request.files.get('audio')
+    
+    logging.info(f"📁 Request files: {list(request.files.keys())}")
+    logging.info(f"🖼️ Image file: {image_file}, filename: {image_file.filename if image_file else 'None'}")
+    logging.info(f"🎤 Audio file: {audio_file}, filename: {audio_file.filename if audio_file else 'None'}")
+    
+    contents = [enhanced_prompt]
+    
+    # Handle image if present
+    if image_file and image_file.filename:
+        # Check file size (limit to 4MB for better compatibility)
+        image_file.stream.seek(0, 2)  # Seek to end
+        file_size = image_file.stream.tell()
+        image_file.stream.seek(0)  # Reset to beginning
+        
+        logging.info(f"Image file received: {image_file.filename}, size: {file_size} bytes")
+        
+        # Check if file is too large (4MB limit for better compatibility)
+        if file_size > 4 * 1024 * 1024:  # 4MB
+            logging.warning(f"Image file too large: {file_size} bytes")
+            return None, (jsonify({'error': f'ပုံဖိုင်က အရမ်းကြီးလွန်းပါတယ်။ 4MB ထက်နည်းတဲ့ ပုံကို သုံးပါ။ သင့်ဖိုင်က {file_size / (1024*1024):.1f}MB ရှိပါတယ်။'}), 400)
         
-        # Configure Gemini with user's API key
         try:
-            user_client = genai.Client(api_key=api_key_to_use)
-            logging.info(f"User's Gemini API configured successfully using {'session' if current_user.api_key else 'database'} API key")
-        except Exception as api_error:
-            logging.error(f"Error configuring user's API key: {api_error}")
-            error_message = str(api_error)
-            if 'quota' in error_message.lower() or '429' in error_message:
-                return jsonify({'error': 'Content generation is currently unavailable. Please try again later.'}), 503
-            return jsonify({'error': 'Invalid API key. Please check your Gemini API key.'}), 400
-        # request.form is used for multipart/form-data
-        data = request.form
-        page_name = data.get('pageName', '')
-        prompt = data.get('prompt', '')
-        purpose = data.get('purpose', '')
-        
-        # Validate required fields
-        if not page_name.strip():
-            return jsonify({'error': 'Page Name လိုအပ်ပါတယ်။ Facebook™️ Page သို့မဟုတ် Brand အမည် ထည့်ပါ။'}), 400
-        
-        if not prompt.strip():
-            return jsonify({'error': 'Topic လိုအပ်ပါတယ်။ Content ၏ အဓိက အကြောင်းအရာ ထည့်ပါ။'}), 400
-        writing_style = data.get('writingStyle', '')
-        audience = data.get('audience', '')
-        word_count = data.get('wordCount', '')
-        keywords = data.get('keywords', '')
-        hashtags = data.get('hashtags', '')
-        cta = data.get('cta', '')
-        negative_constraints = data.get('negativeConstraints', '')
-        language = data.get('language', 'myanmar')
-        
-        
-        # Get emoji toggle state
-        include_emojis = data.get('includeEmojis', 'true').lower() == 'true'
-
-        # Set language instruction
-        language_instructions = {
-            'myanmar': "The response must be in the Burmese (Myanmar) language.",
-            'english': "The response must be in English."
-        }
-        language_instruction = language_instructions.get(language, "The response must be in the Burmese (Myanmar) language.")
-
-
-        # Construct emoji instruction based on toggle and word count
-        emoji_instruction = ""
-        if include_emojis:
-            # Dynamic emoji count based on word count
-            word_count_int = int(word_count) if word_count.isdigit() else 300
-            if word_count_int <= 100:
-                emoji_count = "1-2"
-            elif word_count_int <= 200:
-                emoji_count = "2-4"
-            else:
-                emoji_count = "3-6"
+            # Downscale (max 1536x1536) and re-encode to a compact JPEG off the request thread
+            image_bytes, image_mime_type, _ = prepare_image(read_upload_capped(image_file.stream, file_size))
+            contents.append(gemini_inline_part(image_bytes, image_mime_type))
+            logging.info("Added image to content generation.")
+        except Exception as img_error:
+            logging.error(f"Error processing image: {img_error}")
+    
+    # Handle voice audio if present
+    if audio_file and audio_file.filename:
+        try:
+            # Read the upload straight from the request stream for inline
+            # submission (avoids the ragStoreName requirement of file uploads)
+            audio_bytes = read_upload_capped(audio_file.stream, MAX_AUDIO_UPLOAD_BYTES)
+            if audio_bytes is None:
+                logging.warning(f"Audio file exceeds {MAX_AUDIO_UPLOAD_BYTES} bytes")
+                return None, (jsonify({
+                    'error': f'Audio recording is too large. Please keep it under {MAX_AUDIO_UPLOAD_BYTES // (1024 * 1024)}MB.'
+                }), 413)
             
-            emoji_instruction = f"\n\nIMPORTANT: Include appropriate emojis naturally throughout the content to make it more engaging and visually appealing. Use emojis that are relevant to the topic and context, but don't overuse them - aim for {emoji_count} well-placed emojis for this {word_count_int}-word post."
-        else:
-            emoji_instruction = "\n\nIMPORTANT: Do NOT include any emojis in the content. Generate clean text content without any emoji symbols."
-
-        # Convert purpose key to human-readable text
-        purpose_map = {
-            'informative': 'Provide useful information and insights',
-            'engagement': 'Encourage audience interaction and engagement',
-            'sales': 'Promote and sell products or services',
-            'emotional': 'Create emotional connection and feelings',
-            'announcement': 'Announce events, updates, or news',
-            'educational': 'Teach and educate the audience',
-            'showcase': 'Showcase product features and benefits'
-        }
-        purpose_text = purpose_map.get(purpose, purpose) if purpose else 'General content'
-        
-        # Content style examples for each purpose type
-        content_style_examples = {
-            'informative': """
-EXAMPLE REFERENCE (Follow this style and format):
----
-MOT Genius Auto Writer: Content Generator တွေထဲက ထူးခြားတဲ့ ရွေးချယ်မှု 🎉
-
-Content Creation လောကမှာ အချိန်ကုန်သက်သာပြီး အရည်အသွေးမြင့်တဲ့ စာသားတွေ ထွက်ဖို့ဆိုတာ ခက်ခဲတဲ့အလုပ်တစ်ခုပါ။ ဒါပေမဲ့ MOT က ဖန်တီးထားတဲ့ "Genius Auto Writer" ဆိုတဲ့ Content Generator က ဒီအခက်အခဲတွေကို ဖြေရှင်းပေးနိုင်တဲ့ အဖြေတစ်ခု ဖြစ်လာပါတယ်။
-
-Genius Auto Writer ရဲ့ အားသာချက်တွေက ဘာတွေလဲ? 🤔
-
-၁။ အချိန်တိုအတွင်း Content ထွက်ခြင်း: စီးပွားရေးလုပ်ငန်းတွေ၊ Content Creator တွေအတွက် အရေးကြီးဆုံးက အချိန်ပါ။ Genius Auto Writer ဟာ မိနစ်ပိုင်းအတွင်းကိုပဲ ကိုယ်လိုချင်တဲ့ Format နဲ့ Content အရှည်တစ်ခုကို ထုတ်ပေးနိုင်ပါတယ်။
-
-၂။ Purpose အမျိုးမျိုးနဲ့ ရွေးချယ်နိုင်ခြင်း: information ပေးချင်တာလား၊ ကိုယ့် brand ကို ကြေညာချင်တာလား၊ စတဲ့ Content ပုံစံ အမျိုးမျိုးအတွက် ကြိုတင်ပြင်ဆင်ထားတဲ့ Template တွေ အများကြီး ပါဝင်ပါတယ်။
-
-၃။ Plagiarism ကင်းစင်တဲ့ Content: ဒီ Generator ရဲ့ စနစ်ဟာ ရှိပြီးသား စာတွေကို ကူးယူတာမျိုး မဟုတ်ဘဲ၊ သတ်မှတ်ထားတဲ့ စည်းမျဉ်းတွေနဲ့ စာသားတည်ဆောက်ပုံ (Structure) ကို အသုံးပြုပြီး စာသားအသစ်တွေကို စီစဉ်ဖွဲ့စည်းတာ ဖြစ်တဲ့အတွက် ထွက်လာတဲ့ Content တွေဟာ Unique ဖြစ်ပြီး Plagiarism ကင်းပါတယ်။
-
-Content Creator တစ်ယောက်အတွက် အခြေခံ Content တွေကို မြန်မြန်ဆန်ဆန် ဖန်တီးချင်တယ်ဆိုရင် Genius Auto Writer ဟာ တကယ်ကို အားကိုးရတဲ့ tool တစ်ခု ဖြစ်ပါတယ်။ 💡✍️
-
-#ContentGenerator #GeniusAutoWriter #ContentMarketing
----
-""",
-            'engagement': """
-EXAMPLE REFERENCE (Follow this style and format):
----
-Content အမြန်လိုနေတဲ့ သူတွေ လက်တွေ့ကြုံဖူးတဲ့ အခက်အခဲများ! 😩
-
-တစ်ခါတလေကျရင် Content Idea တွေက ဦးနှောက်ထဲမှာ ပြည့်ကျပ်နေပြီး လက်တွေ့ စာရေးတဲ့အခါ စကားလုံးတွေ တောင့်တင်း နေဖူးလား? ဒါမှမဟုတ် အချိန်က မရှိနေလို့ အရေးကြီးတဲ့ Post တစ်ခုကို အလျင်စလို ရေးလိုက်ရလို့ Quality ကျသွားဖူးလား? 🤔
-
-အထူးသဖြင့် စီးပွားရေးလုပ်ငန်းရှင်တွေ၊ Freelance Writer တွေနဲ့ Social Media ကို နေ့စဉ်သုံးနေရသူတွေဆိုရင် ဒီလို စိန်ခေါ်မှုတွေကို မကြာခဏ ရင်ဆိုင်ရမှာပါ။
-
-👉 ဒီလို အချိန်ကုန်သက်သာစေဖို့၊ စာရေးအားကို မြှင့်တင်ပေးဖို့ MOT က Genius Auto Writer ဆိုတဲ့ Content Generator Tool ကို ဖန်တီးထားတာပါ။ 💥
-
-ဒါဆို ကျွန်တော်တို့ သိချင်တာလေး မေးကြည့်ပါရစေ...
-
-၁။ Genius Auto Writer ဆိုတဲ့ Content Generator က Content Creation Workflow ကို ဘယ်လောက်အထိ မြန်စေမယ်လို့ ထင်ပါသလဲ? 🚀
-
-၂။ ဒီလို Tool ကိုသုံးတဲ့အခါ Content Quality ပိုင်းကို စိုးရိမ်မိတာမျိုး ရှိပါသလား? ဘယ်အချက်ကို အဓိကထားပြီး စစ်ဆေးဖြစ်မလဲ? 🧐
-
-၃။ အမြန်ဆုံး ရေးချင်တဲ့ Content အမျိုးအစား (ဥပမာ- Product Description, Caption, Blog Outline) က ဘာလဲ?
-
-ကိုယ်တိုင် ကြုံတွေ့နေရတဲ့ အတွေ့အကြုံတွေ၊ Genius Auto Writer အပေါ် အမြင်တွေကို Comment မှာ ဝေမျှပေးခဲ့ဦးနော်။ 👇💬
-
-#ContentLife #WriterStruggle #MOTGenius
----
-""",
-            'sales': """
-EXAMPLE REFERENCE (Follow this style and format):
----
-အချိန်မရှိဘူးလား? Content အရည်အသွေး ကျမှာကို စိုးရိမ်နေလား? 😱
-
-Business အတွက်ဖြစ်ဖြစ်၊ Personal Brand အတွက်ဖြစ်ဖြစ်... Social Media မှာ နေ့တိုင်း Content တင်နေရတာဟာ အချိန်ကုန်၊ လူပင်ပန်း တဲ့ အလုပ်တစ်ခုပါ။ Blog Post တစ်ခုရေးဖို့ နာရီပေါင်းများစွာ ပေးရတယ်။ Product Caption ကောင်းကောင်းတစ်ခု ဖန်တီးဖို့ စကားလုံးတွေ ရှာဖွေနေရတယ်။ 😓
-
-ဒါတွေ အားလုံးကို ဖြေရှင်းပေးမယ့် ကျွန်တော်တို့ MOT ရဲ့ "Content Generation Tool လေးတစ်ခုကို မိတ်ဆက်ပေးပါရစေ! 🚀
-
-Genius Auto Writer ကို ဘာလို့ သုံးသင့်လဲ? (ရလဒ်တွေကိုပဲ ကြည့်ပါ!)
-
-✅ Content ထုတ်လုပ်မှု 5X အထိ မြန်ဆန်လာမယ်:
-Blog Outline၊ Email Header၊ Sales Copy၊ Facebook™️ Ad Caption တွေအတွက် စက္ကန့်ပိုင်းအတွင်း Professional Draft တွေ ရလာမယ်။
-
-✅ Plagiarism ကင်းစင်တဲ့ Original Content:
-ကျွန်တော်တို့ရဲ့ Tool ဟာ ရှိပြီးသားစာတွေကို ကူးယူတာ မဟုတ်ဘဲ၊ User သတ်မှတ်ချက်အတိုင်း စာသားဖွဲ့စည်းပုံစည်းမျဉ်းတွေ (Rule-Based Structure) နဲ့ စာသားအသစ်တွေကို စနစ်တကျ ပြန်စီပေးတာကြောင့် Content တွေဟာ Unique ဖြစ်ပါတယ်။
-
-✅ SEO/Sales အတွက် Targeting စွမ်းအား မြင့်မားမယ်:
-ကိုယ်ထည့်လိုက်တဲ့ Keywords တွေ၊ ရောင်းချမယ့် Product ရဲ့ အချက်အလက်တွေနဲ့ ကိုက်ညီတဲ့ စာသားတွေကို တိတိကျကျ ဖန်တီးပေးတာကြောင့် ထွက်လာတဲ့ Content တွေဟာ Target Audience ကို ဆွဲဆောင်ဖို့ ပိုမို ထိရောက်တယ်။ 🎯
-
-အခုပဲ Genius Auto Writer ကို စတင် အသုံးပြုပြီး Content Marketing ကို နောက်တစ်ဆင့် တက်လှမ်းလိုက်ပါ။ 👇
-
-#SalesCopy #ContentGenerator #DigitalMarketingTool
----
-""",
-            'emotional': """
-EXAMPLE REFERENCE (Follow this style and format):
----
-စာရေးချင်စိတ် အပြည့်နဲ့ ကွန်ပျူတာရှေ့ ထိုင်ချလိုက်ပေမဲ့... Screen က အလွတ်အတိုင်းပဲ ကျန်နေတဲ့အခါ ဘယ်လိုခံစားရလဲ? 😩
-
-စိတ်ကူးတွေက ရင်ထဲမှာ အစီအရီရှိနေတယ်။ ဒီနေ့ ဘာတင်ရမယ်၊ ဘယ်လို Message ပေးရမယ်ဆိုတာလည်း သိတယ်။ ဒါပေမဲ့ လက်တွေ့ စာလုံးပေါင်းပြီး ရေးရတော့မယ့်အချိန်မှာ "ဘယ်ကနေ စရမလဲ" ဆိုတဲ့ မေးခွန်းက ကိုယ့်ကို အားအင်ကုန်ခမ်းစေတယ်။ 😔
-
-တစ်ခါတလေကျရင် ဒီလို အချိန်တွေကြောင့် Quality ကောင်းတဲ့ Content မထုတ်နိုင်ဘဲ "ဒီတစ်ခါတော့ ဒီအတိုင်းပဲ တင်လိုက်တော့မယ်" ဆိုပြီး လက်လျှော့လိုက်ရတာမျိုးတွေ မကြာခဏ ကြုံဖူးမှာပါ။
-
-ကျွန်တော်တို့ MOT အဖွဲ့သားတွေ ဒီခံစားချက်ကို နားလည်ပြီး လုပ်ငန်းရှင်တွေရဲ့ စိတ်ကူးတွေ ပျောက်ဆုံးမသွားစေဖို့ Genius Auto Writer ကို ဖန်တီးခဲ့တာဖြစ်ပါတယ်။ 💡
-
-"မရေးနိုင်ဘူး" ဆိုတဲ့ ဝန်ထုပ်ဝန်ပိုးကို လွှတ်ချလိုက်ပါ။ ကိုယ့်ရဲ့ စိတ်ကူးတွေကို လွတ်လပ်စွာ စီးဆင်းခွင့်ပေးပြီး Genius Auto Writer ရဲ့ စွမ်းအားနဲ့ တွဲဖက်လိုက်ပါ။ 💖✍️
-
-#CreativeStruggles #StorytellingTool #ContentQuality
----
-""",
-            'announcement': """
-EXAMPLE REFERENCE (Follow this style and format):
----
-🔥 Content Revolution ၏ အစ: Genius Auto Writer Launch Event! 🔥
-
-Content Marketing လောကကို လှုပ်ခတ်စေမယ့်၊ Content ရေးသားခြင်း နည်းလမ်းတွေကို လုံးဝပြောင်းလဲပစ်မယ့် tool အသစ်တစ်ခု မိတ်ဆက်ပွဲကို MOT ကနေ ခမ်းနားစွာ ကျင်းပတော့မှာ ဖြစ်ပါတယ်။
-
-အချိန်ကုန်ခံပြီး အားထုတ်စိုက်ထုတ်နေရတဲ့ Content ရေးသားမှုတွေ၊ Idea ညှစ်ထုတ်ရတဲ့ နေ့ရက်တွေကို ရပ်တန့်ဖို့ အချိန်တန်ပါပြီ။ အခုဆိုရင် Content Quality အကောင်းဆုံးနဲ့ Facebook™️ Page မှာ ချက်ချင်းယူသုံးလို့ရတဲ့ Post တွေကို စက္ကန့်ပိုင်းအတွင်း ဖန်တီးပေးနိုင်တဲ့ Genius Auto Writer ရဲ့ စွမ်းဆောင်ရည်တွေကို ကိုယ်တိုင် မြင်တွေ့ရမယ့် ပွဲပါ။
-
-🎯 ဘာလို့ ဒီပွဲကို မဖြစ်မနေ လာရောက်သင့်လဲ?
-
-✅ MOT ရဲ့ Smart Content Engine တစ်ခုဖြစ်တဲ့ Genius Auto Writer ဟာ တော်ရုံ Content Generator တွေလို AI စနစ်ကို အခြေခံပြီး ရေးထားတာမျိုး မဟုတ်ပါဘူး။ Content Writer ဝါရင့်တွေရဲ့ အောင်မြင်ပြီးသား ရောင်းအားတက် နည်းစနစ်တွေ၊ စိတ်ပညာပေါ် အခြေခံတဲ့ စာသား Framework တွေကို ပေါင်းစပ်တည်ဆောက်ထားတာ ဖြစ်ပါတယ်။
-
-✅ တကယ့်စွမ်းဆောင်ရည်ကို ကိုယ်တိုင်တွေ့ရမယ်: Content Writer ငှားစရာမလိုဘဲ၊ စျေးကြီးပေးပြီး Agency ကိုအပ်စရာမလိုဘဲ Content Quality အမြင့်ဆုံးတွေကို ဘယ်လို ထုတ်ယူနိုင်လဲဆိုတာကို Live Demo ပြသသွားမှာပါ။
-
-✅ Business Opportunity: Content အတွက် အချိန်ကုန်၊ လူကုန် မခံချင်တဲ့ Business Owner တွေ၊ Marketer တွေအတွက် တစ်လလုံး Content အကန့်အသတ်မရှိ ထုတ်နိုင်မယ့် ဒီ Tool ကို ဘယ်လို အကျိုးရှိရှိ သုံးနိုင်မလဲဆိုတဲ့ Business Strategy တွေကိုပါ မျှဝေပေးသွားမှာပါ။
-
-✅ Q&A Session: Genius Auto Writer နဲ့ပတ်သက်ပြီး သိချင်တာတွေ၊ စိတ်ဝင်စားတာတွေကို တိုက်ရိုက်မေးမြန်းနိုင်မယ့် အခွင့်အရေး ရရှိမှာပါ။
-
-📅 ပွဲကျင်းပမည့် နေ့ရက်နှင့် အချိန်:
-2025 ခုနှစ်၊ နိုဝင်ဘာလ ၁၀ ရက် (တနင်္လာနေ့)
-နံနက် ၁၀ နာရီ မှ နေ့လယ် ၁၂ နာရီအထိ
-
-📌 နေရာ:
-(ရန်ကုန်မြို့ရှိ TBD ခန်းမအမည် / Online Webinar ဆိုပါက Zoom Link ကို ဖော်ပြပါမည်)
-
-Content Marketing မှာ ပြိုင်ဘက်တွေထက် တစ်လှမ်းသာချင်သူတွေ၊ Content ရေးသားမှုအတွက် စိန်ခေါ်နေသူတွေ ဒီအခွင့်အရေးကို လက်မလွတ်သင့်ပါဘူး။
-
-ပွဲတက်ရောက်ရန် စိတ်ဝင်စားပါက Messenger မှာ "Launch" လို့ စာတိုပေးပို့ပြီး အမြန်ဆုံး ကြိုတင်စာရင်းပေးလိုက်ပါ။
-
-#GeniusAutoWriterLaunch
-#MOT
-#ContentGenerator
-#EventAnnouncement
-#MyanmarBusiness
-#DigitalMarketingMyanmar
-#ContentStrategy
-#NewProduct
----
-""",
-            'educational': """
-EXAMPLE REFERENCE (Follow this style and format):
----
-📣 Content ရေးသားမှုကို အဆင့်မြှင့်တင်ဖို့ Genius Auto Writer ကို ဘယ်လို ထိထိရောက်ရောက် သုံးမလဲ? (Step-by-Step Guide) 💡
-
-Page အတွက် Quality ကောင်းတဲ့ Content တွေကို အချိန်ကုန်သက်သာစွာ ထုတ်ယူချင်သူတွေအတွက် MOT ရဲ့ "Genius Auto Writer" Content Generator ဟာ အကောင်းဆုံး tool တစ်ခုပါ။
-
-Genius Auto Writer အသုံးပြုနည်း အဆင့် (၃) ဆင့်:
-
-အဆင့် ၁။ Content Purpose ကို ရွေးပါ 🎯
-
-Genius Auto Writer ကို စတင်အသုံးပြုတာနဲ့ အရင်ဆုံး သင့် Content ရဲ့ ရည်ရွယ်ချက် (Purpose) ကို ရွေးချယ်ပေးရပါမယ်။
-
-• ကြော်ငြာ/Promotion: ပစ္စည်းအသစ် မိတ်ဆက်တာ၊ Discount ပေးတာမျိုးတွေအတွက်။
-• Engagement: Comment, Like, Share များဖို့ မေးခွန်းထုတ်တာ၊ ဂိမ်းဆော့ခိုင်းတာမျိုး။
-• Announcement/Update: သတင်း၊ အစီအစဉ် အသစ်တွေ ကြေညာဖို့။
-
-အဆင့် ၂။ Key Information တွေကို ထည့်သွင်းပါ ⌨️
-
-ဒါက အရေးအကြီးဆုံး အပိုင်းပါ။ သင်ထုတ်ယူချင်တဲ့ Content နဲ့ ပတ်သက်တဲ့ အချက်အလက် (Key Information) တွေကို တိတိကျကျ ရိုက်ထည့်ပေးရပါမယ်။
-
-• ထုတ်ကုန်/ဝန်ဆောင်မှု နာမည်: (ဥပမာ: MOT Digital Course)
-• ထူးခြားချက်/အကျိုးကျေးဇူး: (ဥပမာ: တစ်လအတွင်း Sale တက်စေမယ့် နည်းဗျူဟာ)
-• Target Audience: (ဥပမာ: အွန်လိုင်းစီးပွားရေး လုပ်ငန်းရှင်များ)
-
-အဆင့် ၃။ Generate ကို နှိပ်ပြီး ချက်ချင်း အသုံးပြုပါ ✅
+            logging.info(f"🎤 Audio file loaded: {len(audio_bytes)} bytes ({len(audio_bytes) / 1024:.2f} KB)")
+            
+            # Create inline audio part from bytes
+            audio_part = gemini_inline_part(audio_bytes, "audio/webm")
+            
+            logging.info("Audio prepared for inline submission")
+            
+            # Update the prompt for voice generation with stronger instructions and style example
+            voice_prompt = render_prompt('voice', **prompt_fields)
+            
+            # Build contents array with audio (inline data)
+            audio_contents = [voice_prompt, audio_part]
+            
+            # Add image if present
+            if len(contents) > 1:  # Image was added
+                audio_contents.append(contents[1])
+            
+            logging.info("Sending voice prompt, audio, and image (if any) to Gemini native audio model.")
+            request_contents = audio_contents
+            
+        except Exception as audio_error:
+            logging.error(f"❌ AUDIO PROCESSING ERROR: {audio_error}")
+            logging.error(f"Error type: {type(audio_error).__name__}")
+            import traceback
+            logging.error(f"Full traceback: {traceback.format_exc()}")
+            
+            # Return error to user instead of falling back silently
+            return None, (jsonify({
+                'error': f'Audio processing failed: {str(audio_error)}. Please try recording again or check your audio format.'
+            }), 500)
+    elif len(contents) > 1:
+        # Regular generation (text + image)
+        logging.info("Sending prompt and image to Gemini.")
+        request_contents = contents
+    else:
+        logging.info("Sending text-only prompt to Gemini.")
+        request_contents = enhanced_prompt
+    
+    return {'client': user_client, 'contents': request_contents}, None
 
-အဆင့် (၁) နဲ့ (၂) မှာ လိုအပ်တဲ့ အချက်အလက်တွေ ဖြည့်ပြီးတာနဲ့ "Generate" ခလုတ်ကို နှိပ်လိုက်ပါ။ စက္ကန့်ပိုင်းအတွင်းမှာ Facebook™️ Page မှာ တိုက်ရိုက်ယူသုံးလို့ရတဲ့ Content ကို ရရှိပါလိမ့်မယ်။
 
-#ContentWritingTips #DigitalMarketingMyanmar #GeniusAutoWriter
----
-""",
-            'showcase': """
-EXAMPLE REFERENCE (Follow this style and format):
----
-⚡️ Content ရေးသားမှုကို စက္ကန့်ပိုင်းအတွင်း အပြီးသတ်ပေးမယ့် Genius Auto Writer ရဲ့ Live Demo! 🚀
+def read_upload_capped(stream, limit):
+    """Read an uploaded file's bytes from its stream, enforcing a size cap.
 
-Page Admin တွေ၊ Content Creator တွေ စိတ်ပူနေရတဲ့ "Content Quality" နဲ့ "အချိန်ကုန်သက်သာမှု" ဆိုတဲ့ ပြဿနာနှစ်ခုကို MOT ရဲ့ Genius Auto Writer နဲ့ ဘယ်လို ဖြေရှင်းနိုင်လဲဆိုတာ ဒီနေ့ လက်တွေ့ပြသသွားပါမယ်။
+    Returns the bytes, or None if the upload is larger than ``limit``. The size
+    is checked before reading. Uploads parsed by InMemoryUploadRequest are
+    BytesIO, whose getvalue() hands back the parsed buffer without copying it.
+    """
+    stream.seek(0, os.SEEK_END)
+    if stream.tell() > limit:
+        return None
+    if isinstance(stream, io.BytesIO):
+        return stream.getvalue()
+    stream.seek(0)
+    return stream.read()
+
+
+# Quota accounting. Every change is one conditional UPDATE ... RETURNING run
+# in autocommit mode: a single round-trip, and concurrent requests can't act
+# on a stale count and over-grant. Generations reserve before the Gemini call
+# and refund if it fails.
+TRIAL_CONTENT_LIMIT = 5
+
+def _quota_update(statement):
+    """Run a quota UPDATE ... RETURNING on its own autocommit connection"""
+    with db.engine.connect().execution_options(isolation_level='AUTOCOMMIT') as conn:
+        return conn.execute(statement).scalar()
+
+def reserve_content_quota(user_id):
+    """Reserve one generation; returns the new content_count, or None if the quota is used up"""
+    count = _quota_update(
+        db.update(User)
+        .where(User.id == user_id,
+               db.or_(User.user_type == 'normal', User.content_count < TRIAL_CONTENT_LIMIT))
+        .values(content_count=User.content_count + 1)
+        .returning(User.content_count)
+    )
+    invalidate_user_snapshot(user_id)
+    return count
+
+def refund_content_quota(user_id):
+    """Give back a reserved generation; returns the new content_count"""
+    count = _quota_update(
+        db.update(User)
+        .where(User.id == user_id, User.content_count > 0)
+        .values(content_count=User.content_count - 1)
+        .returning(User.content_count)
+    )
+    invalidate_user_snapshot(user_id)
+    return count
+
+def reserve_image_credits(user_id, quantity):
+    """Take quantity image credits; returns the credits left, or None if there aren't enough"""
+    credits = _quota_update(
+        db.update(User)
+        .where(User.id == user_id, User.image_credits >= quantity)
+        .values(image_credits=User.image_credits - quantity)
+        .returning(User.image_credits)
+    )
+    invalidate_user_snapshot(user_id)
+    return credits
+
+def refund_image_credits(user_id, quantity):
+    """Give back image credits taken by reserve_image_credits"""
+    credits = _quota_update(
+        db.update(User)
+        .where(User.id == user_id)
+        .values(image_credits=User.image_credits + quantity)
+        .returning(User.image_credits)
+    )
+    invalidate_user_snapshot(user_id)
+    return credits
 
-Genius Auto Writer က AI စနစ်မဟုတ်ဘဲ၊ Content ပညာရှင်တွေရဲ့ ရေးသားမှုပုံစံနဲ့ Facebook™️ Trend တွေကို အခြေခံပြီး တည်ဆောက်ထားတဲ့ MOT ရဲ့ ကိုယ်ပိုင် Generator ဖြစ်ပါတယ်။
+def _reserve_generation(user):
+    """Reserve one generation for user; returns an error response if the quota is used up"""
+    if user.is_admin:
+        return None
+    count = reserve_content_quota(user.id)
+    if count is None:
+        logging.error(f"User {user.email} has reached content generation limit")
+        return jsonify({'error': "You've reached the maximum limit of generating contents for your trial plan. To continue using Genius AutoWriter without interruption, please upgrade your subscription."}), 403
+    # Reflect the new count without marking the row dirty (a later flush must not overwrite it)
+    set_committed_value(user, 'content_count', count)
+    logging.info(f"User {user.email} content count reserved, now {count}")
+    return None
+
+def _refund_generation(user):
+    """Undo _reserve_generation after a failed Gemini call"""
+    if user.is_admin:
+        return
+    count = refund_content_quota(user.id)
+    if count is not None:
+        set_committed_value(user, 'content_count', count)
+    logging.info(f"Refunded content generation for user {user.email}")
 
-Genius Auto Writer ရဲ့ 'Premium Quality' Output ကို ကြည့်လိုက်ပါ! 👀
+def _quota_stats(user):
+    return {
+        'remaining_count': user.get_remaining_content_count_json(),
+        'total_generated': user.content_count
+    }
 
-ဥပမာအနေနဲ့၊ ကျွန်တော်တို့ရဲ့ Product အသစ်ဖြစ်တဲ့ 'MOT Sales Booster Course' အတွက် Promotion Content တစ်ခု လိုချင်တယ်ဆိုပါစို့။
 
-Inputs (ထည့်သွင်းရမယ့် အချက်အလက်များ):
+# Form fields (and their defaults) that fully determine a text-only generation
+GENERATION_CACHE_FIELDS = {
+    'pageName': '', 'prompt': '', 'purpose': '', 'writingStyle': '', 'audience': '',
+    'wordCount': '', 'keywords': '', 'hashtags': '', 'cta': '', 'negativeConstraints': '',
+    'language': 'myanmar', 'includeEmojis': 'true'
+}
 
-1. Content Purpose: Promotion / Course Sales
-2. Product Name: MOT Sales Booster Course
-3. Key Benefits:
-   • တစ်ပတ်အတွင်း Sales 100% တက်စေမယ့် လျှို့ဝှက်ချက်
-   • Target Audience ကို စနစ်တကျ ရှာဖွေနည်း
-   • လက်တွေ့ အကောင်အထည်ဖော်ရုံပဲ လိုတဲ့ Practical Strategy တွေ
 
-Output (Genius Auto Writer က ထုတ်ပေးမယ့် Content ပုံစံ):
+def _generation_cache_key():
+    """Result-cache key for the submitted generation form, or None if uncacheable.
 
-✨ ခေါင်းစဉ်: ❌ Sale တွေကျလို့ စိတ်ညစ်မနေပါနဲ့! ၇ ရက်အတွင်း ၁၀၀% တိုးတက်စေမယ့် လျှို့ဝှက်ချက်!
+    Only text-only requests are cached (uploads aren't part of the key), the
+    cache must be enabled via GENERATION_CACHE_TTL, and ``regenerate=true``
+    always bypasses it.
+    """
+    if not app.config['GENERATION_CACHE_TTL']:
+        return None
+    if request.form.get('regenerate', 'false').lower() == 'true':
+        return None
+    if any(upload and upload.filename for upload in request.files.values()):
+        return None
+    
+    # Collapse whitespace and case differences that don't change the prompt
+    normalized = {
+        field: ' '.join(request.form.get(field, default).split())
+        for field, default in GENERATION_CACHE_FIELDS.items()
+    }
+    for field in ('purpose', 'writingStyle', 'language', 'includeEmojis'):
+        normalized[field] = normalized[field].lower()
+    normalized['model'] = GEMINI_TEXT_MODEL
+    
+    digest = hashlib.sha256(json.dumps(normalized, sort_keys=True, ensure_ascii=False).encode('utf-8')).hexdigest()
+    return cache_key('generation', current_user.id, digest)
 
-📈 စာကိုယ် (Body):
-Online Business လုပ်ငန်းရှင်တွေအတွက် Sale ပိုတက်ဖို့ ခေါင်းစားနေရပြီလား? MOT Sales Booster Course ကို စတင်လိုက်ပါ။ ဒီ Course က တခြား Course တွေလို သီအိုရီတွေချည်း မဟုတ်ဘဲ၊ လက်တွေ့အသုံးချနိုင်မယ့် Practical Strategy တွေကိုပဲ အဓိကထား သင်ပေးမှာပါ။
 
-➡️ CTA: အချိန်မဆွဲပါနဲ့၊ ဒီနေ့ပဲ စာရင်းသွင်းပြီး သင်တန်းကြေး Discount ရယူလိုက်ပါ။
+def _store_generation_result(result_cache_key, content):
+    """Remember a generated post under its result-cache key (if caching applies)."""
+    if result_cache_key:
+        set_cache(result_cache_key, {'content': content}, expire=app.config['GENERATION_CACHE_TTL'])
 
-#GeniusAutoWriterDemo #MOTTech #ContentTool #ProductShowcase
----
-"""
-        }
-        
-        # Get the example for the selected purpose
-        style_example = content_style_examples.get(purpose, "")
-        
-        # Construct a more detailed prompt with style example reference
-        enhanced_prompt = f"""You are a 10 years experience social media content writer. Directly generate a social media post. Do not include any introductory phrases, explanations, or preambles. {language_instruction}{emoji_instruction}
 
-{style_example}
+def _run_generation_job(user_id, generation, quota_stats, reserved, result_cache_key=None):
+    """Run a queued generation on the job pool; the quota was reserved at submit time."""
+    try:
+        response = generation['client'].models.generate_content(
+            model=GEMINI_TEXT_MODEL,
+            contents=generation['contents']
+        )
+        if not (hasattr(response, 'text') and response.text):
+            logging.error("Gemini response has no text content")
+            raise RuntimeError('Failed to generate content. Please try again.')
+    except Exception:
+        if reserved:
+            # Job threads run outside the request, so refund in a fresh app context
+            with app.app_context():
+                refund_content_quota(user_id)
+        raise
+    
+    processed_content = add_facebook_trademark(response.text)
+    _store_generation_result(result_cache_key, processed_content)
+    return dict(quota_stats, content=processed_content)
 
-IMPORTANT: Use the example above as a REFERENCE for style, format, structure, and tone. DO NOT copy the example content. Create NEW and ORIGINAL content based on the topic and requirements below, but follow the same writing style, formatting patterns, and engagement approach shown in the example.
 
-Page/Brand Name: {page_name}
-Topic: {prompt}
-Purpose: {purpose_text}
-Writing Style: {writing_style}
-Target Audience: {audience}
-Word Count: Approximately {word_count} words
-Keywords to include: {keywords}
-Hashtags to include: {hashtags}
-Call to Action: {cta}
-Avoid/Don't include: {negative_constraints}
-        """
-        
-        # Check for uploaded files
-        image_file = request.files.get('image')
-        audio_file = request.files.get('audio')
-        
-        logging.info(f"📁 Request files: {list(request.files.keys())}")
-        logging.info(f"🖼️ Image file: {image_file}, filename: {image_file.filename if image_file else 'None'}")
-        logging.info(f"🎤 Audio file: {audio_file}, filename: {audio_file.filename if audio_file else 'None'}")
-        
-        if audio_file and audio_file.filename:
-            # Get audio file size
-            audio_file.seek(0, 2)
-            audio_size = audio_file.tell()
-            audio_file.seek(0)
-            logging.info(f"🎤 Audio file size: {audio_size} bytes ({audio_size / 1024:.2f} KB)")
-        
-        contents = [enhanced_prompt]
-        
-        # Handle image if present
-        if image_file and image_file.filename:
-            # Check file size (limit to 4MB for better compatibility)
-            image_file.stream.seek(0, 2)  # Seek to end
-            file_size = image_file.stream.tell()
-            image_file.stream.seek(0)  # Reset to beginning
-            
-            logging.info(f"Image file received: {image_file.filename}, size: {file_size} bytes")
-            
-            # Check if file is too large (4MB limit for better compatibility)
-            if file_size > 4 * 1024 * 1024:  # 4MB
-                logging.warning(f"Image file too large: {file_size} bytes")
-                return jsonify({'error': f'ပုံဖိုင်က အရမ်းကြီးလွန်းပါတယ်။ 4MB ထက်နည်းတဲ့ ပုံကို သုံးပါ။ သင့်ဖိုင်က {file_size / (1024*1024):.1f}MB ရှိပါတယ်။'}), 400
-            
+@app.route('/generate-content', methods=['POST'])
+@login_required
+def generate_content():
+    try:
+        generation, error_response = _prepare_generation()
+        if error_response:
+            return error_response
+        
+        # Identical resubmissions are answered from the result cache (doesn't use quota)
+        result_cache_key = _generation_cache_key()
+        cached_result = get_cache(result_cache_key) if result_cache_key else None
+        if cached_result:
+            logging.info(f"Generation result cache HIT for user {current_user.id}")
+            return jsonify(dict(_quota_stats(current_user), content=cached_result['content'], cached=True))
+        
+        # Count the generation up front; it is refunded if Gemini fails
+        quota_error = _reserve_generation(current_user)
+        if quota_error:
+            return quota_error
+        
+        # Async mode: queue the Gemini call and let the client poll /api/jobs/<id>
+        if request.form.get('async', 'false').lower() == 'true':
             try:
-                # Reset stream position to beginning
-                image_file.stream.seek(0)
-                img = PIL.Image.open(image_file.stream)
-                
-                # Resize image if it's too large (max 1536x1536 for better quality)
-                max_size = (1536, 1536)
-                if img.size[0] > max_size[0] or img.size[1] > max_size[1]:
-                    logging.info(f"Resizing image from {img.size} to fit {max_size}")
-                    img.thumbnail(max_size, PIL.Image.Resampling.LANCZOS)
-                
-                # Convert to RGB if necessary
-                if img.mode != 'RGB':
-                    img = img.convert('RGB')
-                
-                contents.append(img)
-                logging.info("Added image to content generation.")
-            except Exception as img_error:
-                logging.error(f"Error processing image: {img_error}")
+                job_id = submit_job(current_user.id, _run_generation_job, current_user.id, generation,
+                                    _quota_stats(current_user), not current_user.is_admin, result_cache_key)
+            except JobQueueFull as queue_error:
+                _refund_generation(current_user)
+                return jsonify({'error': str(queue_error)}), 503
+            return jsonify({
+                'job_id': job_id,
+                'status': 'queued',
+                'status_url': url_for('generation_job_status', job_id=job_id)
+            }), 202
         
-        # Handle voice audio if present
-        if audio_file and audio_file.filename:
-            try:
-                import tempfile
-                import time
-                
-                # Save audio file temporarily
-                temp_audio = tempfile.NamedTemporaryFile(delete=False, suffix='.webm')
-                audio_file.save(temp_audio.name)
-                temp_audio.close()
-                
-                logging.info(f"Audio file saved to: {temp_audio.name}")
-                
-                # Use Gemini 2.5 Flash SDK Client
-                # (Client is already set in user_client)
-                # Read audio file as bytes for inline upload (avoid ragStoreName requirement)
-                with open(temp_audio.name, 'rb') as audio_file_handle:
-                    audio_bytes = audio_file_handle.read()
-                
-                logging.info(f"Audio file loaded: {len(audio_bytes)} bytes")
-                
-                # Create inline audio part from bytes
-                audio_part = types.Part.from_bytes(
-                    data=audio_bytes,
-                    mime_type="audio/webm"
-                )
-                
-                logging.info("Audio prepared for inline submission")
-                
-                # Update the prompt for voice generation with stronger instructions and style example
-                voice_prompt = f"""CRITICAL INSTRUCTION: You MUST listen carefully to the audio recording and create content based EXACTLY on what you hear in the audio. DO NOT generate generic or unrelated content.
-
-You are a 10 years experience social media content writer. Listen to the provided audio recording and analyze the EXACT content, tone, and context spoken in the audio. Generate a social media post that directly reflects what was said in the audio. Do not include any introductory phrases, explanations, or preambles. {language_instruction}{emoji_instruction}
-
-{style_example}
-
-IMPORTANT: Use the example above as a REFERENCE for style, format, structure, and tone. DO NOT copy the example content. Create NEW and ORIGINAL content based on the audio recording and requirements below, but follow the same writing style, formatting patterns, and engagement approach shown in the example.
-
-Page/Brand Name: {page_name}
-Purpose: {purpose_text}
-Writing Style: {writing_style}
-Target Audience: {audience}
-Word Count: Approximately {word_count} words
-Keywords to include: {keywords}
-Hashtags to include: {hashtags}
-Call to Action: {cta}
-Avoid/Don't include: {negative_constraints}
-
-IMPORTANT: The content MUST be based on the audio recording. Listen to what is actually said and create content about that specific topic. If the audio talks about food, write about food. If it talks about business, write about business. Match the audio content exactly."""
-                
-                # Build contents array with audio (inline data)
-                audio_contents = [voice_prompt, audio_part]
-                
-                # Add image if present
-                if len(contents) > 1:  # Image was added
-                    audio_contents.append(contents[1])
-                
-                logging.info("Sending voice prompt, audio, and image (if any) to Gemini native audio model.")
-                response = user_client.models.generate_content(
-                    model='gemini-2.5-flash',
-                    contents=audio_contents
-                )
-                
-                # Clean up temp file
-                try:
-                    os.unlink(temp_audio.name)
-                except:
-                    pass
-                
-            except Exception as audio_error:
-                logging.error(f"❌ AUDIO PROCESSING ERROR: {audio_error}")
-                logging.error(f"Error type: {type(audio_error).__name__}")
-                import traceback
-                logging.error(f"Full traceback: {traceback.format_exc()}")
-                
-                # Return error to user instead of falling back silently
-                return jsonify({
-                    'error': f'Audio processing failed: {str(audio_error)}. Please try recording again or check your audio format.'
-                }), 500
-        else:
-            # Regular generation (text + image if present)
-            if len(contents) > 1:
-                logging.info("Sending prompt and image to Gemini.")
-                response = user_client.models.generate_content(
-                    model='gemini-2.5-flash',
-                    contents=contents
-                )
-            else:
-                logging.info("Sending text-only prompt to Gemini.")
-                response = user_client.models.generate_content(
-                    model='gemini-2.5-flash',
-                    contents=enhanced_prompt
-                )
+        try:
+            response = generation['client'].models.generate_content(
+                model=GEMINI_TEXT_MODEL,
+                contents=generation['contents']
+            )
+        except Exception:
+            _refund_generation(current_user)
+            raise
 
         # Ensure response has text content
         if hasattr(response, 'text') and response.text:
-            # Increment user's content count for non-admin users IMMEDIATELY after generation
-            if not current_user.is_admin:
-                current_user.content_count += 1
-                db.session.commit()
-                logging.info(f"User {current_user.email} content count incremented to {current_user.content_count}")
-            
             # Apply Facebook trademark processing to generated content
             processed_content = add_facebook_trademark(response.text)
+            _store_generation_result(result_cache_key, processed_content)
             
             # Return content along with updated user stats
-            return jsonify({
-                'content': processed_content,
-                'remaining_count': current_user.get_remaining_content_count_json(),
-                'total_generated': current_user.content_count
-            })
+            return jsonify(dict(_quota_stats(current_user), content=processed_content))
         else:
             logging.error("Gemini response has no text content")
+            _refund_generation(current_user)
             return jsonify({'error': 'Failed to generate content. Please try again.'}), 500
             
     except Exception as e:
         logging.error(f"Error in generate_content: {e}")
         # Ensure error response is always valid JSON
-        error_message = str(e)
-        if len(error_message) > 200:  # Truncate very long error messages
-            error_message = error_message[:200] + "..."
-        return jsonify({'error': error_message}), 500
+        return jsonify({'error': generation_error_message(e)}), 500
+
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+@login_required
+def generation_job_status(job_id):
+    """Return the status/result of a queued generation job.
+
+    Pass ``?wait=<seconds>`` (max 25) to long-poll until the job finishes.
+    """
+    wait = max(0.0, min(request.args.get('wait', 0, type=float), 25.0))
+    job = wait_for_job(job_id, wait) if wait else get_job(job_id)
+    
+    if not job or job.get('user_id') != current_user.id:
+        return jsonify({'error': 'Job not found'}), 404
+    
+    payload = {'job_id': job_id, 'status': job['status']}
+    if job['status'] == 'done':
+        payload.update(job['result'])
+    elif job['status'] == 'failed':
+        payload['error'] = job['error']
+    return jsonify(payload)
+
+
+def _sse_event(event, payload):
+    """Format one Server-Sent Event frame with a JSON payload."""
+    return f"event: {event}\ndata: {json.dumps(payload, ensure_ascii=False)}\n\n"
+
+
+@app.route('/generate-content/stream', methods=['POST'])
+@login_required
+def generate_content_stream():
+    """Streaming variant of /generate-content.
+
+    Accepts the same form fields and forwards Gemini's output as Server-Sent
+    Events: ``chunk`` events carry trademark-processed text deltas, followed by
+    a single ``done`` event with the updated counts (or an ``error`` event).
+    The generation is reserved before streaming and refunded unless the
+    stream completes; cached results reserve nothing.
+    """
+    try:
+        generation, error_response = _prepare_generation()
+    except Exception as e:
+        logging.error(f"Error in generate_content_stream: {e}")
+        return jsonify({'error': generation_error_message(e)}), 500
+    if error_response:
+        return error_response
+    
+    result_cache_key = _generation_cache_key()
+    cached_result = get_cache(result_cache_key) if result_cache_key else None
+    reserved = not cached_result
+    if reserved:
+        # Count the generation up front; it is refunded unless the stream completes
+        quota_error = _reserve_generation(current_user)
+        if quota_error:
+            return quota_error
+
+    def stream_events():
+        trademark_stream = FacebookTrademarkStream()
+        emitted = []
+        generated_any = False
+        completed = False
+        try:
+            if cached_result:
+                logging.info(f"Generation result cache HIT for user {current_user.id}")
+                yield _sse_event('chunk', {'text': cached_result['content']})
+                completed = True
+                yield _sse_event('done', dict(_quota_stats(current_user), cached=True))
+                return
+
+            chunks = generation['client'].models.generate_content_stream(
+                model=GEMINI_TEXT_MODEL,
+                contents=generation['contents']
+            )
+            for chunk in chunks:
+                text = getattr(chunk, 'text', None)
+                if not text:
+                    continue
+                generated_any = True
+                processed = trademark_stream.feed(text)
+                if processed:
+                    emitted.append(processed)
+                    yield _sse_event('chunk', {'text': processed})
+
+            if not generated_any:
+                logging.error("Gemini stream produced no text content")
+                yield _sse_event('error', {'error': 'Failed to generate content. Please try again.'})
+                return
+
+            remainder = trademark_stream.finish()
+            if remainder:
+                emitted.append(remainder)
+                yield _sse_event('chunk', {'text': remainder})
+
+            completed = True
+            _store_generation_result(result_cache_key, ''.join(emitted))
+            yield _sse_event('done', _quota_stats(current_user))
+        except Exception as e:
+            logging.error(f"Error streaming generated content: {e}")
+            db.session.rollback()
+            yield _sse_event('error', {'error': generation_error_message(e)})
+        finally:
+            # Also covers the client disconnecting mid-stream
+            if reserved and not completed:
+                _refund_generation(current_user)
+
+    response = Response(stream_with_context(stream_events()), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    # Keep reverse proxies from buffering the stream
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
 @app.route('/uploads/<path:filename>')
 def uploaded_file(filename):
     return send_from_directory(app.config['UPLOAD_FOLDER'], filename)
@@ -2191,13 +2675,18 @@ def admin_cleanup_expired_users():
         ).all()
         
         deleted_count = 0
+        deleted_ids = []
         for user in expired_users:
             logging.info(f"Manual admin cleanup: Deleting expired user: {user.email} (expired at: {user.expires_at})")
+            deleted_ids.append(user.id)
             db.session.delete(user)
             deleted_count += 1
         
         if deleted_count > 0:
             db.session.commit()
+            for user_id in deleted_ids:
+                invalidate_user_snapshot(user_id)
+            invalidate_admin_stats()
             logging.info(f"Manual cleanup: Successfully deleted {deleted_count} expired user accounts")
         
         return jsonify({
@@ -2210,6 +2699,21 @@ def admin_cleanup_expired_users():
         db.session.rollback()
         return jsonify({'error': 'Failed to cleanup expired users'}), 500
 
+@app.route('/admin/reconcile-content-counters', methods=['POST'])
+@login_required
+def admin_reconcile_content_counters():
+    """Admin route to repair drifted per-user content counters"""
+    if not current_user.is_admin:
+        return jsonify({'error': 'Access denied'}), 403
+    
+    try:
+        repaired = reconcile_content_counters()
+        return jsonify({'success': True, 'repaired_count': len(repaired), 'repaired_user_ids': repaired})
+    except Exception as e:
+        logging.error(f"Error reconciling content counters: {e}")
+        db.session.rollback()
+        return jsonify({'error': 'Failed to reconcile content counters'}), 500
+
 @app.route('/test-toast')
 @login_required
 def test_toast():
@@ -2302,12 +2806,19 @@ def daily_cleanup():
         
         logging.info(f"Daily cleanup: Found {expired_count} expired users (not deleting - admin must delete manually)")
         
+        # The counter repair rewrites the user table, so only Vercel Cron
+        # (Authorization: Bearer <CRON_SECRET>) or an admin may trigger it
+        counters_reconciled = None
+        if _has_bearer_token(os.getenv('CRON_SECRET')) or (current_user.is_authenticated and current_user.is_admin):
+            counters_reconciled = len(reconcile_content_counters())
+        
         return jsonify({
             'success': True,
             'message': 'Daily cleanup completed - auto-deletion disabled',
             'expired_count': expired_count,
             'expired_users': expired_emails,
             'note': 'Expired users are NOT deleted automatically. Admin must delete manually.',
+            'counters_reconciled': counters_reconciled,
             'timestamp': current_time.isoformat()
         })
         
@@ -2327,7 +2838,7 @@ def create_admin_user():
     # Check if admin user already exists by email
     admin = User.query.filter_by(email=admin_email).first()
     if not admin:
-        password_hash = bcrypt.generate_password_hash(admin_password).decode('utf-8')
+        password_hash = hash_password(admin_password)
         admin = User(
             email=admin_email,
             password_hash=password_hash,
@@ -2543,11 +3054,34 @@ def migrate_database():
         raise e
 
 # Initialize database function (called on first request)
+def migrate_content_counters():
+    """Add the denormalized content counter columns to an existing user table and backfill them"""
+    with db.engine.connect() as conn:
+        result = conn.execute(db.text("""
+            SELECT column_name 
+            FROM information_schema.columns 
+            WHERE table_name='user' AND column_name='last_content_at'
+        """))
+        if result.fetchone():
+            return False
+        
+        logging.info("Adding content counter columns to user table...")
+        conn.execute(db.text('ALTER TABLE "user" ADD COLUMN IF NOT EXISTS total_contents INTEGER NOT NULL DEFAULT 0'))
+        conn.execute(db.text('ALTER TABLE "user" ADD COLUMN IF NOT EXISTS published_contents INTEGER NOT NULL DEFAULT 0'))
+        conn.execute(db.text('ALTER TABLE "user" ADD COLUMN IF NOT EXISTS last_content_at TIMESTAMP'))
+        conn.commit()
+    
+    reconcile_content_counters()
+    logging.info("Content counter columns added and backfilled")
+    return True
+
 def init_db():
     """Initialize database tables and admin user"""
     try:
         with app.app_context():
             db.create_all()
+            migrate_content_counters()
+            # Indexes on existing tables: run scripts/create_indexes.py (CONCURRENTLY) once per deploy
             # migrate_database()
             create_admin_user()
             
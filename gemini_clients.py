@@ -0,0 +1,99 @@
+import os
+import time
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+
+# Process-wide pool of Gemini clients, keyed by a hash of the API key so the
+# raw key never sits in memory as a dict key or shows up in logs.
+MAX_CLIENTS = int(os.getenv('GEMINI_CLIENT_CACHE_SIZE', '64'))
+CLIENT_IDLE_TTL = int(os.getenv('GEMINI_CLIENT_IDLE_TTL', '1800'))  # seconds
+
+_clients = OrderedDict()  # key hash -> (client, last_used)
+_lock = threading.Lock()
+_stats = {'hits': 0, 'misses': 0, 'evictions': 0}
+
+
+def _key_hash(api_key):
+    """Hash an API key for use as a cache key"""
+    return hashlib.sha256(api_key.encode('utf-8')).hexdigest()
+
+
+def _evict_idle(now):
+    """Drop clients that have not been used within CLIENT_IDLE_TTL (lock held)"""
+    # OrderedDict is kept in LRU order, so idle clients are at the front
+    while _clients:
+        _, last_used = next(iter(_clients.values()))
+        if now - last_used < CLIENT_IDLE_TTL:
+            break
+        _clients.popitem(last=False)
+        _stats['evictions'] += 1
+
+
+def get_client(api_key):
+    """Return a pooled genai.Client for the API key, creating it on first use"""
+    key = _key_hash(api_key)
+    now = time.monotonic()
+
+    with _lock:
+        _evict_idle(now)
+        entry = _clients.get(key)
+        if entry:
+            _clients[key] = (entry[0], now)
+            _clients.move_to_end(key)
+            _stats['hits'] += 1
+            return entry[0]
+        _stats['misses'] += 1
+
+    # Build outside the lock; a racing request for the same key just loses.
+    # google.genai takes ~0.5 s to import, so it is loaded here on first use
+    # rather than on every serverless cold start.
+    from google import genai
+    client = genai.Client(api_key=api_key)
+
+    with _lock:
+        existing = _clients.get(key)
+        if existing:
+            client = existing[0]
+        _clients[key] = (client, now)
+        _clients.move_to_end(key)
+        while len(_clients) > MAX_CLIENTS:
+            _clients.popitem(last=False)
+            _stats['evictions'] += 1
+
+    logging.debug(f"Gemini client created for key {key[:8]}")
+    return client
+
+
+def inline_part(data, mime_type):
+    """Wrap raw bytes (image, audio) as an inline Gemini request part"""
+    from google.genai import types
+    return types.Part.from_bytes(data=data, mime_type=mime_type)
+
+
+def evict_client(api_key):
+    """Remove the pooled client for an API key (e.g. after the key changed)"""
+    if not api_key:
+        return False
+
+    with _lock:
+        removed = _clients.pop(_key_hash(api_key), None) is not None
+        if removed:
+            _stats['evictions'] += 1
+    return removed
+
+
+def get_client_stats():
+    """Get client pool statistics"""
+    with _lock:
+        total = _stats['hits'] + _stats['misses']
+        return {
+            'size': len(_clients),
+            'max_size': MAX_CLIENTS,
+            'idle_ttl': CLIENT_IDLE_TTL,
+            'hits': _stats['hits'],
+            'misses': _stats['misses'],
+            'evictions': _stats['evictions'],
+            'hit_rate': round(_stats['hits'] / total, 3) if total else 0.0
+        }
@@ -0,0 +1,135 @@
+import os
+import time
+import uuid
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import redis_cache
+from redis_cache import cache_key, get_cache, set_cache
+
+# Background pool for generation jobs so slow Gemini calls don't hold a web worker
+JOB_WORKERS = int(os.getenv('GENERATION_JOB_WORKERS', '4'))
+MAX_PENDING_JOBS = int(os.getenv('GENERATION_MAX_PENDING_JOBS', '32'))
+JOB_TTL = int(os.getenv('GENERATION_JOB_TTL', '600'))  # seconds
+POLL_INTERVAL = 0.5  # seconds between Redis reads while long-polling
+
+_executor = ThreadPoolExecutor(max_workers=JOB_WORKERS, thread_name_prefix='generation-job')
+_pending = threading.BoundedSemaphore(MAX_PENDING_JOBS)
+
+# In-process fallback store (used when Redis is not configured)
+_local_jobs = {}
+_local_lock = threading.Lock()
+_job_events = {}
+
+
+class JobQueueFull(Exception):
+    """Raised when too many generation jobs are already queued"""
+
+
+def generation_error_message(error):
+    """Truncate upstream error text so the JSON/SSE payload stays small."""
+    error_message = str(error)
+    if len(error_message) > 200:  # Truncate very long error messages
+        error_message = error_message[:200] + "..."
+    return error_message
+
+
+def _job_key(job_id):
+    return cache_key('generation_job', job_id)
+
+
+def _save_job(job):
+    """Persist job state to Redis, or to the in-process store as a fallback"""
+    job['updated_at'] = time.time()
+    # Job state changes underneath pollers in other processes, so skip the L1 tier
+    if redis_cache.redis_client and set_cache(_job_key(job['id']), job, expire=JOB_TTL, use_l1=False):
+        with _local_lock:
+            _local_jobs.pop(job['id'], None)
+        return
+    with _local_lock:
+        _local_jobs[job['id']] = dict(job)
+        # Drop expired local jobs so the fallback store stays bounded
+        cutoff = time.time() - JOB_TTL
+        for stale_id in [k for k, v in _local_jobs.items() if v['updated_at'] < cutoff]:
+            _local_jobs.pop(stale_id, None)
+
+
+def get_job(job_id):
+    """Get the current state of a job, or None if it is unknown/expired"""
+    with _local_lock:
+        job = _local_jobs.get(job_id)
+    if job:
+        return dict(job)
+    return get_cache(_job_key(job_id), use_l1=False)
+
+
+def submit_job(user_id, func, *args, **kwargs):
+    """Queue func(*args, **kwargs) on the job pool and return the new job id.
+
+    The function's return value becomes the job result; an exception marks
+    the job as failed with its (truncated) message as the error.
+    """
+    if not _pending.acquire(blocking=False):
+        raise JobQueueFull('Too many generation jobs are queued. Please try again shortly.')
+
+    job_id = uuid.uuid4().hex
+    job = {
+        'id': job_id,
+        'user_id': user_id,
+        'status': 'queued',
+        'result': None,
+        'error': None,
+        'created_at': time.time()
+    }
+    done = threading.Event()
+    with _local_lock:
+        _job_events[job_id] = done
+    _save_job(job)
+
+    def run():
+        try:
+            job['status'] = 'running'
+            _save_job(job)
+            job['result'] = func(*args, **kwargs)
+            job['status'] = 'done'
+        except Exception as e:
+            logging.error(f"Generation job {job_id} failed: {e}")
+            job['status'] = 'failed'
+            job['error'] = generation_error_message(e)
+        finally:
+            _save_job(job)
+            done.set()
+            with _local_lock:
+                _job_events.pop(job_id, None)
+            _pending.release()
+
+    try:
+        _executor.submit(run)
+    except Exception:
+        with _local_lock:
+            _job_events.pop(job_id, None)
+        _pending.release()
+        raise
+
+    logging.info(f"Queued generation job {job_id} for user {user_id}")
+    return job_id
+
+
+def wait_for_job(job_id, timeout):
+    """Long-poll a job until it finishes or timeout seconds pass"""
+    deadline = time.monotonic() + timeout
+    with _local_lock:
+        done = _job_events.get(job_id)
+
+    while True:
+        job = get_job(job_id)
+        if not job or job['status'] in ('done', 'failed'):
+            return job
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return job
+        if done:
+            # Job runs in this process - wake up as soon as it finishes
+            done.wait(remaining)
+        else:
+            time.sleep(min(POLL_INTERVAL, remaining))
@@ -0,0 +1,240 @@
+import io
+import os
+import time
+import hashlib
+import logging
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as PoolTimeout
+from concurrent.futures.process import BrokenProcessPool
+
+# Image preparation for Gemini uploads: decode at reduced scale, downscale and
+# re-encode to a compact JPEG/WebP off the request thread.
+MAX_IMAGE_SIZE = (1536, 1536)
+OUTPUT_FORMAT = os.getenv('IMAGE_PREP_FORMAT', 'JPEG').upper()  # JPEG or WEBP
+OUTPUT_QUALITY = int(os.getenv('IMAGE_PREP_QUALITY', '85'))
+# Process pools need fork + shared memory, which serverless runtimes don't offer
+PREP_WORKERS = int(os.getenv('IMAGE_PREP_WORKERS', '0' if os.getenv('VERCEL') else '2'))
+MAX_QUEUED = PREP_WORKERS * 4
+POOL_TIMEOUT = float(os.getenv('IMAGE_PREP_TIMEOUT', '20'))  # seconds to wait on a pool worker
+
+MIME_TYPES = {'JPEG': 'image/jpeg', 'WEBP': 'image/webp'}
+
+# On-disk cache of prepared images keyed by a hash of the upload, so repeat
+# uploads of the same photo skip decode/resize/encode entirely
+CACHE_MAX_BYTES = int(os.getenv('IMAGE_CACHE_MAX_BYTES', str(100 * 1024 * 1024)))
+_cache_dir = None
+
+_pool = None
+_pool_lock = threading.Lock()
+_slots = threading.BoundedSemaphore(MAX_QUEUED) if PREP_WORKERS else None
+_stats_lock = threading.Lock()
+_stats = {'images': 0, 'in_pool': 0, 'inline': 0, 'decode_ms': 0.0, 'resize_ms': 0.0, 'encode_ms': 0.0,
+          'cache_hits': 0, 'cache_misses': 0, 'cache_evictions': 0, 'pool_failures': 0}
+_cache_lock = threading.Lock()
+
+
+def _prepare(data, max_size, output_format, quality):
+    """Decode, downscale and re-encode an image (runs in a worker process)"""
+    import PIL.Image  # loaded on first use to keep it off the cold-start path
+    start = time.perf_counter()
+    img = PIL.Image.open(io.BytesIO(data))
+    source_size = img.size
+    if img.format == 'JPEG':
+        # Let libjpeg decode at 1/2, 1/4 or 1/8 scale - still >= max_size
+        img.draft('RGB', max_size)
+    img.load()
+    decoded = time.perf_counter()
+
+    if img.size[0] > max_size[0] or img.size[1] > max_size[1]:
+        img.thumbnail(max_size, PIL.Image.Resampling.LANCZOS)
+    if img.mode != 'RGB':
+        img = img.convert('RGB')
+    resized = time.perf_counter()
+
+    output = io.BytesIO()
+    img.save(output, format=output_format, quality=quality)
+    encoded = time.perf_counter()
+
+    return output.getvalue(), {
+        'source_size': source_size,
+        'output_size': img.size,
+        'input_bytes': len(data),
+        'output_bytes': output.tell(),
+        'decode_ms': round((decoded - start) * 1000, 2),
+        'resize_ms': round((resized - decoded) * 1000, 2),
+        'encode_ms': round((encoded - resized) * 1000, 2)
+    }
+
+
+def _get_pool():
+    """Create the process pool on first use (None if disabled or unavailable)"""
+    global _pool
+    if not PREP_WORKERS:
+        return None
+    with _pool_lock:
+        if _pool is None:
+            try:
+                _pool = ProcessPoolExecutor(max_workers=PREP_WORKERS)
+            except Exception as e:
+                logging.error(f"Image prep pool unavailable, processing inline: {e}")
+                return None
+        return _pool
+
+
+def _discard_pool(pool, reason):
+    """Drop a broken or stuck pool so the next call builds a fresh one"""
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    with _stats_lock:
+        _stats['pool_failures'] += 1
+    logging.error(f"Image prep pool discarded ({reason})")
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def init_image_cache(directory):
+    """Enable the prepared-image cache in directory (e.g. under UPLOAD_FOLDER)"""
+    global _cache_dir
+    try:
+        os.makedirs(directory, exist_ok=True)
+        _cache_dir = directory
+        return True
+    except OSError as e:
+        logging.warning(f"Image cache disabled, could not create {directory}: {e}")
+        _cache_dir = None
+        return False
+
+
+def _cache_path(data):
+    """Cache file path for upload bytes and the current prep settings"""
+    digest = hashlib.blake2b(data, digest_size=20)
+    digest.update(f"{MAX_IMAGE_SIZE}:{OUTPUT_FORMAT}:{OUTPUT_QUALITY}".encode())
+    return os.path.join(_cache_dir, f"{digest.hexdigest()}.{OUTPUT_FORMAT.lower()}")
+
+
+def _read_cached(path):
+    """Return cached bytes and mark the entry as recently used, or None"""
+    try:
+        with open(path, 'rb') as handle:
+            image_bytes = handle.read()
+        os.utime(path)  # mtime doubles as the LRU timestamp
+        return image_bytes
+    except OSError:
+        return None
+
+
+def _write_cached(path, image_bytes):
+    """Store prepared bytes atomically and trim the cache to its size budget"""
+    try:
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temp_path, 'wb') as handle:
+            handle.write(image_bytes)
+        os.replace(temp_path, path)
+    except OSError as e:
+        logging.warning(f"Could not write image cache entry: {e}")
+        return
+
+    with _cache_lock:
+        entries = []
+        total = 0
+        for entry in os.scandir(_cache_dir):
+            if entry.name.endswith('.tmp') or not entry.is_file():
+                continue
+            try:
+                stat = entry.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+            total += stat.st_size
+
+        # Evict least recently used entries until we are back under budget
+        entries.sort()
+        evicted = 0
+        for _, size, entry_path in entries:
+            if total <= CACHE_MAX_BYTES:
+                break
+            try:
+                os.remove(entry_path)
+                total -= size
+                evicted += 1
+            except OSError:
+                pass
+
+    if evicted:
+        with _stats_lock:
+            _stats['cache_evictions'] += evicted
+
+
+def prepare_image(data):
+    """Prepare uploaded image bytes for Gemini.
+
+    Returns (image_bytes, mime_type, metrics). Repeat uploads are served from
+    the on-disk cache; otherwise work goes to the bounded process pool when
+    it has room, or runs on the calling thread. A broken pool is rebuilt on
+    the next call and the image is prepared inline; a worker that takes
+    longer than POOL_TIMEOUT raises TimeoutError.
+    """
+    mime_type = MIME_TYPES.get(OUTPUT_FORMAT, 'image/jpeg')
+    cache_path = _cache_path(data) if _cache_dir else None
+    if cache_path:
+        image_bytes = _read_cached(cache_path)
+        if image_bytes is not None:
+            with _stats_lock:
+                _stats['cache_hits'] += 1
+            logging.info(f"Image cache HIT ({len(data)} -> {len(image_bytes)} bytes)")
+            return image_bytes, mime_type, {'cached': True, 'input_bytes': len(data), 'output_bytes': len(image_bytes)}
+
+    args = (data, MAX_IMAGE_SIZE, OUTPUT_FORMAT, OUTPUT_QUALITY)
+    pool = _get_pool()
+    in_pool = False
+
+    if pool and _slots.acquire(blocking=False):
+        try:
+            image_bytes, metrics = pool.submit(_prepare, *args).result(timeout=POOL_TIMEOUT)
+            in_pool = True
+        except BrokenProcessPool:
+            # A worker died (OOM, decoder crash); the pool stays broken until rebuilt
+            _discard_pool(pool, 'worker died')
+        except PoolTimeout:
+            # Don't retry inline: an image that stalls a worker would stall the request too
+            _discard_pool(pool, f'no result after {POOL_TIMEOUT}s')
+            raise TimeoutError(f'Image preparation took longer than {POOL_TIMEOUT}s')
+        finally:
+            _slots.release()
+    if not in_pool:
+        image_bytes, metrics = _prepare(*args)
+
+    if cache_path:
+        _write_cached(cache_path, image_bytes)
+
+    with _stats_lock:
+        if cache_path:
+            _stats['cache_misses'] += 1
+        _stats['images'] += 1
+        _stats['in_pool' if in_pool else 'inline'] += 1
+        for stage in ('decode_ms', 'resize_ms', 'encode_ms'):
+            _stats[stage] += metrics[stage]
+
+    logging.info(
+        f"Image prepared {metrics['source_size']} -> {metrics['output_size']}, "
+        f"{metrics['input_bytes']} -> {metrics['output_bytes']} bytes "
+        f"(decode {metrics['decode_ms']}ms, resize {metrics['resize_ms']}ms, encode {metrics['encode_ms']}ms)"
+    )
+    metrics['cached'] = False
+    return image_bytes, mime_type, metrics
+
+
+def get_image_prep_stats():
+    """Get image preparation statistics"""
+    with _stats_lock:
+        stats = dict(_stats)
+    images = stats['images']
+    for stage in ('decode_ms', 'resize_ms', 'encode_ms'):
+        stats[f'avg_{stage}'] = round(stats[stage] / images, 2) if images else 0.0
+        stats[stage] = round(stats[stage], 2)
+    stats['workers'] = PREP_WORKERS
+    stats['output_format'] = OUTPUT_FORMAT
+    stats['cache_enabled'] = _cache_dir is not None
+    stats['cache_max_bytes'] = CACHE_MAX_BYTES
+    return stats
@@ -0,0 +1,125 @@
+import os
+import time
+import hashlib
+import threading
+from redis_cache import cache_key, incr_counters, get_counters, delete_cache
+
+# Sliding-window counts of failed logins per email and per client IP, kept in
+# Redis so brute-force traffic costs O(1) Redis ops instead of a write to the
+# user table per attempt. Each window is approximated from two fixed buckets:
+# the current bucket plus the previous one weighted by how much of it still
+# overlaps the window.
+WINDOW = int(os.getenv('LOGIN_FAILURE_WINDOW', '1800'))  # seconds
+MAX_EMAIL_FAILURES = int(os.getenv('LOGIN_MAX_EMAIL_FAILURES', '5'))
+MAX_IP_FAILURES = int(os.getenv('LOGIN_MAX_IP_FAILURES', '30'))
+# Number of proxies in front of the app that append to X-Forwarded-For; app.py
+# applies ProxyFix with it so request.remote_addr is the real client. Vercel has
+# one; 0 means clients connect directly. When it is unset elsewhere (e.g. gunicorn
+# behind an unknown proxy) every client would share the proxy's address, so the
+# per-IP limit is skipped and only the per-email limit applies.
+_proxy_hops = os.getenv('TRUSTED_PROXY_HOPS', '1' if os.getenv('VERCEL') else '')
+TRUSTED_PROXY_HOPS = int(_proxy_hops) if _proxy_hops else None
+
+# In-process fallback counters (used when Redis is not configured or down)
+_local_counts = {}  # key -> (count, expires_at)
+_local_lock = threading.Lock()
+
+
+def client_ip(request):
+    """Client address for a Flask request, or None if the proxy setup is unknown"""
+    if TRUSTED_PROXY_HOPS is None:
+        return None
+    return request.remote_addr
+
+
+def _bucket_keys(scope, ident, bucket):
+    # Hash identifiers so emails never appear in Redis key names
+    digest = hashlib.sha256(ident.lower().encode('utf-8')).hexdigest()[:32]
+    return cache_key('login_fail', scope, digest, bucket - 1), cache_key('login_fail', scope, digest, bucket)
+
+
+def _local_get(keys):
+    now = time.time()
+    with _local_lock:
+        return [count if expires_at > now else 0
+                for count, expires_at in (_local_counts.get(key, (0, 0)) for key in keys)]
+
+
+def _local_incr(keys, expire):
+    now = time.time()
+    with _local_lock:
+        for stale_key in [k for k, (_, expires_at) in _local_counts.items() if expires_at <= now]:
+            _local_counts.pop(stale_key, None)
+        values = []
+        for key in keys:
+            count = _local_counts.get(key, (0, 0))[0] + 1
+            _local_counts[key] = (count, now + expire)
+            values.append(count)
+        return values
+
+
+class LoginAttempt:
+    """Failure counts for one login request (email + client IP).
+
+    Reading the counts is one MGET; recording a failure is one pipelined
+    INCR/EXPIRE; a successful login clears the email counts with one DEL.
+    """
+
+    def __init__(self, email, ip):
+        now = time.time()
+        bucket = int(now // WINDOW)
+        # Share of the previous bucket that still falls inside the window
+        self._prev_weight = 1 - (now % WINDOW) / WINDOW
+        self._email_keys = _bucket_keys('email', email or '', bucket)
+        self._ip_keys = _bucket_keys('ip', ip, bucket) if ip else ()
+
+        keys = self._email_keys + self._ip_keys
+        counts = get_counters(keys)
+        if counts is None:
+            counts = _local_get(keys)
+        self._counts = dict(zip(keys, counts))
+
+    def _estimate(self, keys):
+        if not keys:
+            return 0
+        previous, current = keys
+        return int(self._counts[current] + self._counts[previous] * self._prev_weight)
+
+    @property
+    def email_failures(self):
+        return self._estimate(self._email_keys)
+
+    @property
+    def ip_failures(self):
+        return self._estimate(self._ip_keys)
+
+    def blocked(self, max_email_failures=MAX_EMAIL_FAILURES):
+        """True if this email or IP has too many recent failures to try again"""
+        return self.email_failures >= max_email_failures or self.ip_failures >= MAX_IP_FAILURES
+
+    def record_failure(self):
+        """Count a failed password and return the email's failures in the window"""
+        keys = (self._email_keys[1],) + self._ip_keys[1:]
+        counts = incr_counters(keys, WINDOW * 2)
+        if counts is None:
+            counts = _local_incr(keys, WINDOW * 2)
+        self._counts.update(zip(keys, counts))
+        return self.email_failures
+
+    def record_success(self):
+        """Forget the email's failures after a successful login"""
+        if not any(self._counts[key] for key in self._email_keys):
+            return
+        _clear_keys(self._email_keys)
+
+
+def _clear_keys(keys):
+    delete_cache(*keys)
+    with _local_lock:
+        for key in keys:
+            _local_counts.pop(key, None)
+
+
+def reset_email_failures(email):
+    """Clear failure counts for an email (e.g. when an admin unlocks the account)"""
+    _clear_keys(_bucket_keys('email', email, int(time.time() // WINDOW)))
@@ -0,0 +1,98 @@
+import os
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# bcrypt is deliberately slow (~250 ms of CPU at cost 12), so password work
+# runs on a small bounded pool instead of every request thread at once. When
+# the queue is full, callers fail fast and the view answers 429.
+LOG_ROUNDS = int(os.getenv('BCRYPT_LOG_ROUNDS', '12'))
+HASH_WORKERS = int(os.getenv('PASSWORD_HASH_WORKERS', str(min(4, os.cpu_count() or 1))))
+MAX_PENDING = int(os.getenv('PASSWORD_HASH_MAX_PENDING', str(HASH_WORKERS * 8)))
+RETRY_AFTER = 2  # seconds, sent with 429 responses
+
+_executor = ThreadPoolExecutor(max_workers=HASH_WORKERS, thread_name_prefix='password-hash')
+_pending = threading.BoundedSemaphore(MAX_PENDING)
+_hasher = None
+
+_stats_lock = threading.Lock()
+_stats = {'hashes': 0, 'checks': 0, 'rehashes': 0, 'rejected': 0, 'busy_ms': 0.0}
+
+
+class PasswordHashingBusy(Exception):
+    """Raised when too many password hashes/checks are already queued"""
+
+
+def init_password_hashing(hasher):
+    """Use hasher (the app's Flask-Bcrypt instance) for all password work"""
+    global _hasher
+    _hasher = hasher
+
+
+def _run(stat, func, *args):
+    """Run func on the hashing pool and wait for its result"""
+    if not _pending.acquire(blocking=False):
+        with _stats_lock:
+            _stats['rejected'] += 1
+        logging.warning("Password hashing queue full, rejecting request")
+        raise PasswordHashingBusy('Too many sign-in requests right now. Please try again in a moment.')
+
+    started = time.perf_counter()
+    try:
+        return _executor.submit(func, *args).result()
+    finally:
+        _pending.release()
+        with _stats_lock:
+            _stats[stat] += 1
+            _stats['busy_ms'] += (time.perf_counter() - started) * 1000
+
+
+def hash_password(password):
+    """Hash a password at the configured cost and return it as text"""
+    return _run('hashes', _hasher.generate_password_hash, password, LOG_ROUNDS).decode('utf-8')
+
+
+def check_password(password_hash, password):
+    """Check a password against its stored hash"""
+    return _run('checks', _hasher.check_password_hash, password_hash, password)
+
+
+def needs_rehash(password_hash):
+    """True if password_hash was made with a different cost than LOG_ROUNDS"""
+    try:
+        # Modular crypt format: $2b$<cost>$<salt+hash>
+        return int(password_hash.split('$')[2]) != LOG_ROUNDS
+    except (AttributeError, IndexError, ValueError):
+        return False
+
+
+def rehash_if_needed(user, password):
+    """Re-hash user's password at the current cost after a successful check.
+
+    Sets user.password_hash and returns True if it changed; the caller commits.
+    """
+    if not needs_rehash(user.password_hash):
+        return False
+    try:
+        user.password_hash = hash_password(password)
+    except PasswordHashingBusy:
+        # The login itself already succeeded; try again on the next one
+        return False
+    with _stats_lock:
+        _stats['rehashes'] += 1
+    logging.info(f"Re-hashed password for user {user.id} at cost {LOG_ROUNDS}")
+    return True
+
+
+def get_password_hashing_stats():
+    """Get password hashing pool statistics"""
+    with _stats_lock:
+        stats = dict(_stats)
+    calls = stats['hashes'] + stats['checks']
+    stats['avg_ms'] = round(stats['busy_ms'] / calls, 2) if calls else 0.0
+    stats['busy_ms'] = round(stats['busy_ms'], 2)
+    stats['workers'] = HASH_WORKERS
+    stats['max_pending'] = MAX_PENDING
+    stats['log_rounds'] = LOG_ROUNDS
+    return stats
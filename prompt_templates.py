@@ -0,0 +1,401 @@
+import sys
+from functools import lru_cache
+from string import Formatter
+
+# Prompt registry for content generation.
+#
+# Everything here is built once at import: purpose descriptions, the Burmese
+# style examples, language instructions and the prompt templates. Rendering a
+# prompt only fills in the user's fields, so generate_content no longer rebuilds
+# these structures (and re-concatenates the static prompt text) per request.
+
+
+class PromptTemplate:
+    """A str.format-style template pre-split into static segments and fields.
+
+    Adjacent static text is merged and interned once; render() copies the
+    segment list, drops the field values into their slots and joins it.
+    partial() bakes fields that are constant for a purpose/language into the
+    static segments ahead of time.
+    """
+
+    __slots__ = ('name', 'fields', '_segments', '_slots')
+
+    def __init__(self, name, source=None, segments=None):
+        self.name = name
+        if segments is None:
+            segments = []
+            for literal, field, _, _ in Formatter().parse(source):
+                if literal:
+                    segments.append((literal, None))
+                if field is not None:
+                    segments.append((None, field))
+
+        # Merge adjacent static text so render() has as few pieces as possible
+        merged = []
+        for literal, field in segments:
+            if field is None and merged and merged[-1][1] is None:
+                merged[-1] = (merged[-1][0] + literal, None)
+            else:
+                merged.append((literal, field))
+
+        self._segments = [sys.intern(literal) if field is None else None for literal, field in merged]
+        self._slots = tuple((index, field) for index, (_, field) in enumerate(merged) if field is not None)
+        self.fields = frozenset(field for _, field in self._slots)
+
+    def partial(self, name, values):
+        """Return a new template with the given fields baked in as static text"""
+        slot_fields = dict(self._slots)
+        return PromptTemplate(name, segments=[
+            (values[slot_fields[index]], None) if slot_fields.get(index) in values
+            else (literal, slot_fields.get(index))
+            for index, literal in enumerate(self._segments)
+        ])
+
+    def render(self, values):
+        """Fill the remaining fields from a mapping of field name -> string"""
+        parts = self._segments.copy()
+        for index, field in self._slots:
+            parts[index] = values[field]
+        return ''.join(parts)
+
+
+class Purpose:
+    """A content purpose: its human-readable description and style example"""
+
+    __slots__ = ('key', 'description', 'example')
+
+    def __init__(self, key, description, example=''):
+        self.key = key
+        self.description = sys.intern(description)
+        self.example = sys.intern(example)
+
+
+PURPOSES = {}
+_compiled_prompts = {}  # (kind, purpose, language) -> PromptTemplate
+
+
+def register_purpose(key, description, example=''):
+    """Add (or replace) a purpose that the generator form can select"""
+    PURPOSES[key] = Purpose(key, description, example)
+    # Drop precompiled prompts so they are rebuilt with the new purpose
+    _compiled_prompts.clear()
+    return PURPOSES[key]
+
+
+LANGUAGE_INSTRUCTIONS = {
+    'myanmar': "The response must be in the Burmese (Myanmar) language.",
+    'english': "The response must be in English."
+}
+DEFAULT_LANGUAGE_INSTRUCTION = LANGUAGE_INSTRUCTIONS['myanmar']
+
+NO_EMOJI_INSTRUCTION = "\n\nIMPORTANT: Do NOT include any emojis in the content. Generate clean text content without any emoji symbols."
+EMOJI_INSTRUCTION = PromptTemplate('emoji', "\n\nIMPORTANT: Include appropriate emojis naturally throughout the content to make it more engaging and visually appealing. Use emojis that are relevant to the topic and context, but don't overuse them - aim for {emoji_count} well-placed emojis for this {word_count}-word post.")
+
+# Content style examples for each purpose type
+_STYLE_EXAMPLES = {
+    'informative': """
+EXAMPLE REFERENCE (Follow this style and format):
+---
+MOT Genius Auto Writer: Content Generator တွေထဲက ထူးခြားတဲ့ ရွေးချယ်မှု 🎉
+
+Content Creation လောကမှာ အချိန်ကုန်သက်သာပြီး အရည်အသွေးမြင့်တဲ့ စာသားတွေ ထွက်ဖို့ဆိုတာ ခက်ခဲတဲ့အလုပ်တစ်ခုပါ။ ဒါပေမဲ့ MOT က ဖန်တီးထားတဲ့ "Genius Auto Writer" ဆိုတဲ့ Content Generator က ဒီအခက်အခဲတွေကို ဖြေရှင်းပေးနိုင်တဲ့ အဖြေတစ်ခု ဖြစ်လာပါတယ်။
+
+Genius Auto Writer ရဲ့ အားသာချက်တွေက ဘာတွေလဲ? 🤔
+
+၁။ အချိန်တိုအတွင်း Content ထွက်ခြင်း: စီးပွားရေးလုပ်ငန်းတွေ၊ Content Creator တွေအတွက် အရေးကြီးဆုံးက အချိန်ပါ။ Genius Auto Writer ဟာ မိနစ်ပိုင်းအတွင်းကိုပဲ ကိုယ်လိုချင်တဲ့ Format နဲ့ Content အရှည်တစ်ခုကို ထုတ်ပေးနိုင်ပါတယ်။
+
+၂။ Purpose အမျိုးမျိုးနဲ့ ရွေးချယ်နိုင်ခြင်း: information ပေးချင်တာလား၊ ကိုယ့် brand ကို ကြေညာချင်တာလား၊ စတဲ့ Content ပုံစံ အမျိုးမျိုးအတွက် ကြိုတင်ပြင်ဆင်ထားတဲ့ Template တွေ အများကြီး ပါဝင်ပါတယ်။
+
+၃။ Plagiarism ကင်းစင်တဲ့ Content: ဒီ Generator ရဲ့ စနစ်ဟာ ရှိပြီးသား စာတွေကို ကူးယူတာမျိုး မဟုတ်ဘဲ၊ သတ်မှတ်ထားတဲ့ စည်းမျဉ်းတွေနဲ့ စာသားတည်ဆောက်ပုံ (Structure) ကို အသုံးပြုပြီး စာသားအသစ်တွေကို စီစဉ်ဖွဲ့စည်းတာ ဖြစ်တဲ့အတွက် ထွက်လာတဲ့ Content တွေဟာ Unique ဖြစ်ပြီး Plagiarism ကင်းပါတယ်။
+
+Content Creator တစ်ယောက်အတွက် အခြေခံ Content တွေကို မြန်မြန်ဆန်ဆန် ဖန်တီးချင်တယ်ဆိုရင် Genius Auto Writer ဟာ တကယ်ကို အားကိုးရတဲ့ tool တစ်ခု ဖြစ်ပါတယ်။ 💡✍️
+
+#ContentGenerator #GeniusAutoWriter #ContentMarketing
+---
+""",
+    'engagement': """
+EXAMPLE REFERENCE (Follow this style and format):
+---
+Content အမြန်လိုနေတဲ့ သူတွေ လက်တွေ့ကြုံဖူးတဲ့ အခက်အခဲများ! 😩
+
+တစ်ခါတလေကျရင် Content Idea တွေက ဦးနှောက်ထဲမှာ ပြည့်ကျပ်နေပြီး လက်တွေ့ စာရေးတဲ့အခါ စကားလုံးတွေ တောင့်တင်း နေဖူးလား? ဒါမှမဟုတ် အချိန်က မရှိနေလို့ အရေးကြီးတဲ့ Post တစ်ခုကို အလျင်စလို ရေးလိုက်ရလို့ Quality ကျသွားဖူးလား? 🤔
+
+အထူးသဖြင့် စီးပွားရေးလုပ်ငန်းရှင်တွေ၊ Freelance Writer တွေနဲ့ Social Media ကို နေ့စဉ်သုံးနေရသူတွေဆိုရင် ဒီလို စိန်ခေါ်မှုတွေကို မကြာခဏ ရင်ဆိုင်ရမှာပါ။
+
+👉 ဒီလို အချိန်ကုန်သက်သာစေဖို့၊ စာရေးအားကို မြှင့်တင်ပေးဖို့ MOT က Genius Auto Writer ဆိုတဲ့ Content Generator Tool ကို ဖန်တီးထားတာပါ။ 💥
+
+ဒါဆို ကျွန်တော်တို့ သိချင်တာလေး မေးကြည့်ပါရစေ...
+
+၁။ Genius Auto Writer ဆိုတဲ့ Content Generator က Content Creation Workflow ကို ဘယ်လောက်အထိ မြန်စေမယ်လို့ ထင်ပါသလဲ? 🚀
+
+၂။ ဒီလို Tool ကိုသုံးတဲ့အခါ Content Quality ပိုင်းကို စိုးရိမ်မိတာမျိုး ရှိပါသလား? ဘယ်အချက်ကို အဓိကထားပြီး စစ်ဆေးဖြစ်မလဲ? 🧐
+
+၃။ အမြန်ဆုံး ရေးချင်တဲ့ Content အမျိုးအစား (ဥပမာ- Product Description, Caption, Blog Outline) က ဘာလဲ?
+
+ကိုယ်တိုင် ကြုံတွေ့နေရတဲ့ အတွေ့အကြုံတွေ၊ Genius Auto Writer အပေါ် အမြင်တွေကို Comment မှာ ဝေမျှပေးခဲ့ဦးနော်။ 👇💬
+
+#ContentLife #WriterStruggle #MOTGenius
+---
+""",
+    'sales': """
+EXAMPLE REFERENCE (Follow this style and format):
+---
+အချိန်မရှိဘူးလား? Content အရည်အသွေး ကျမှာကို စိုးရိမ်နေလား? 😱
+
+Business အတွက်ဖြစ်ဖြစ်၊ Personal Brand အတွက်ဖြစ်ဖြစ်... Social Media မှာ နေ့တိုင်း Content တင်နေရတာဟာ အချိန်ကုန်၊ လူပင်ပန်း တဲ့ အလုပ်တစ်ခုပါ။ Blog Post တစ်ခုရေးဖို့ နာရီပေါင်းများစွာ ပေးရတယ်။ Product Caption ကောင်းကောင်းတစ်ခု ဖန်တီးဖို့ စကားလုံးတွေ ရှာဖွေနေရတယ်။ 😓
+
+ဒါတွေ အားလုံးကို ဖြေရှင်းပေးမယ့် ကျွန်တော်တို့ MOT ရဲ့ "Content Generation Tool လေးတစ်ခုကို မိတ်ဆက်ပေးပါရစေ! 🚀
+
+Genius Auto Writer ကို ဘာလို့ သုံးသင့်လဲ? (ရလဒ်တွေကိုပဲ ကြည့်ပါ!)
+
+✅ Content ထုတ်လုပ်မှု 5X အထိ မြန်ဆန်လာမယ်:
+Blog Outline၊ Email Header၊ Sales Copy၊ Facebook™️ Ad Caption တွေအတွက် စက္ကန့်ပိုင်းအတွင်း Professional Draft တွေ ရလာမယ်။
+
+✅ Plagiarism ကင်းစင်တဲ့ Original Content:
+ကျွန်တော်တို့ရဲ့ Tool ဟာ ရှိပြီးသားစာတွေကို ကူးယူတာ မဟုတ်ဘဲ၊ User သတ်မှတ်ချက်အတိုင်း စာသားဖွဲ့စည်းပုံစည်းမျဉ်းတွေ (Rule-Based Structure) နဲ့ စာသားအသစ်တွေကို စနစ်တကျ ပြန်စီပေးတာကြောင့် Content တွေဟာ Unique ဖြစ်ပါတယ်။
+
+✅ SEO/Sales အတွက် Targeting စွမ်းအား မြင့်မားမယ်:
+ကိုယ်ထည့်လိုက်တဲ့ Keywords တွေ၊ ရောင်းချမယ့် Product ရဲ့ အချက်အလက်တွေနဲ့ ကိုက်ညီတဲ့ စာသားတွေကို တိတိကျကျ ဖန်တီးပေးတာကြောင့် ထွက်လာတဲ့ Content တွေဟာ Target Audience ကို ဆွဲဆောင်ဖို့ ပိုမို ထိရောက်တယ်။ 🎯
+
+အခုပဲ Genius Auto Writer ကို စတင် အသုံးပြုပြီး Content Marketing ကို နောက်တစ်ဆင့် တက်လှမ်းလိုက်ပါ။ 👇
+
+#SalesCopy #ContentGenerator #DigitalMarketingTool
+---
+""",
+    'emotional': """
+EXAMPLE REFERENCE (Follow this style and format):
+---
+စာရေးချင်စိတ် အပြည့်နဲ့ ကွန်ပျူတာရှေ့ ထိုင်ချလိုက်ပေမဲ့... Screen က အလွတ်အတိုင်းပဲ ကျန်နေတဲ့အခါ ဘယ်လိုခံစားရလဲ? 😩
+
+စိတ်ကူးတွေက ရင်ထဲမှာ အစီအရီရှိနေတယ်။ ဒီနေ့ ဘာတင်ရမယ်၊ ဘယ်လို Message ပေးရမယ်ဆိုတာလည်း သိတယ်။ ဒါပေမဲ့ လက်တွေ့ စာလုံးပေါင်းပြီး ရေးရတော့မယ့်အချိန်မှာ "ဘယ်ကနေ စရမလဲ" ဆိုတဲ့ မေးခွန်းက ကိုယ့်ကို အားအင်ကုန်ခမ်းစေတယ်။ 😔
+
+တစ်ခါတလေကျရင် ဒီလို အချိန်တွေကြောင့် Quality ကောင်းတဲ့ Content မထုတ်နိုင်ဘဲ "ဒီတစ်ခါတော့ ဒီအတိုင်းပဲ တင်လိုက်တော့မယ်" ဆိုပြီး လက်လျှော့လိုက်ရတာမျိုးတွေ မကြာခဏ ကြုံဖူးမှာပါ။
+
+ကျွန်တော်တို့ MOT အဖွဲ့သားတွေ ဒီခံစားချက်ကို နားလည်ပြီး လုပ်ငန်းရှင်တွေရဲ့ စိတ်ကူးတွေ ပျောက်ဆုံးမသွားစေဖို့ Genius Auto Writer ကို ဖန်တီးခဲ့တာဖြစ်ပါတယ်။ 💡
+
+"မရေးနိုင်ဘူး" ဆိုတဲ့ ဝန်ထုပ်ဝန်ပိုးကို လွှတ်ချလိုက်ပါ။ ကိုယ့်ရဲ့ စိတ်ကူးတွေကို လွတ်လပ်စွာ စီးဆင်းခွင့်ပေးပြီး Genius Auto Writer ရဲ့ စွမ်းအားနဲ့ တွဲဖက်လိုက်ပါ။ 💖✍️
+
+#CreativeStruggles #StorytellingTool #ContentQuality
+---
+""",
+    'announcement': """
+EXAMPLE REFERENCE (Follow this style and format):
+---
+🔥 Content Revolution ၏ အစ: Genius Auto Writer Launch Event! 🔥
+
+Content Marketing လောကကို လှုပ်ခတ်စေမယ့်၊ Content ရေးသားခြင်း နည်းလမ်းတွေကို လုံးဝပြောင်းလဲပစ်မယ့် tool အသစ်တစ်ခု မိတ်ဆက်ပွဲကို MOT ကနေ ခမ်းနားစွာ ကျင်းပတော့မှာ ဖြစ်ပါတယ်။
+
+အချိန်ကုန်ခံပြီး အားထုတ်စိုက်ထုတ်နေရတဲ့ Content ရေးသားမှုတွေ၊ Idea ညှစ်ထုတ်ရတဲ့ နေ့ရက်တွေကို ရပ်တန့်ဖို့ အချိန်တန်ပါပြီ။ အခုဆိုရင် Content Quality အကောင်းဆုံးနဲ့ Facebook™️ Page မှာ ချက်ချင်းယူသုံးလို့ရတဲ့ Post တွေကို စက္ကန့်ပိုင်းအတွင်း ဖန်တီးပေးနိုင်တဲ့ Genius Auto Writer ရဲ့ စွမ်းဆောင်ရည်တွေကို ကိုယ်တိုင် မြင်တွေ့ရမယ့် ပွဲပါ။
+
+🎯 ဘာလို့ ဒီပွဲကို မဖြစ်မနေ လာရောက်သင့်လဲ?
+
+✅ MOT ရဲ့ Smart Content Engine တစ်ခုဖြစ်တဲ့ Genius Auto Writer ဟာ တော်ရုံ Content Generator တွေလို AI စနစ်ကို အခြေခံပြီး ရေးထားတာမျိုး မဟုတ်ပါဘူး။ Content Writer ဝါရင့်တွေရဲ့ အောင်မြင်ပြီးသား ရောင်းအားတက် နည်းစနစ်တွေ၊ စိတ်ပညာပေါ် အခြေခံတဲ့ စာသား Framework တွေကို ပေါင်းစပ်တည်ဆောက်ထားတာ ဖြစ်ပါတယ်။
+
+✅ တကယ့်စွမ်းဆောင်ရည်ကို ကိုယ်တိုင်တွေ့ရမယ်: Content Writer ငှားစရာမလိုဘဲ၊ စျေးကြီးပေးပြီး Agency ကိုအပ်စရာမလိုဘဲ Content Quality အမြင့်ဆုံးတွေကို ဘယ်လို ထုတ်ယူနိုင်လဲဆိုတာကို Live Demo ပြသသွားမှာပါ။
+
+✅ Business Opportunity: Content အတွက် အချိန်ကုန်၊ လူကုန် မခံချင်တဲ့ Business Owner တွေ၊ Marketer တွေအတွက် တစ်လလုံး Content အကန့်အသတ်မရှိ ထုတ်နိုင်မယ့် ဒီ Tool ကို ဘယ်လို အကျိုးရှိရှိ သုံးနိုင်မလဲဆိုတဲ့ Business Strategy တွေကိုပါ မျှဝေပေးသွားမှာပါ။
+
+✅ Q&A Session: Genius Auto Writer နဲ့ပတ်သက်ပြီး သိချင်တာတွေ၊ စိတ်ဝင်စားတာတွေကို တိုက်ရိုက်မေးမြန်းနိုင်မယ့် အခွင့်အရေး ရရှိမှာပါ။
+
+📅 ပွဲကျင်းပမည့် နေ့ရက်နှင့် အချိန်:
+2025 ခုနှစ်၊ နိုဝင်ဘာလ ၁၀ ရက် (တနင်္လာနေ့)
+နံနက် ၁၀ နာရီ မှ နေ့လယ် ၁၂ နာရီအထိ
+
+📌 နေရာ:
+(ရန်ကုန်မြို့ရှိ TBD ခန်းမအမည် / Online Webinar ဆိုပါက Zoom Link ကို ဖော်ပြပါမည်)
+
+Content Marketing မှာ ပြိုင်ဘက်တွေထက် တစ်လှမ်းသာချင်သူတွေ၊ Content ရေးသားမှုအတွက် စိန်ခေါ်နေသူတွေ ဒီအခွင့်အရေးကို လက်မလွတ်သင့်ပါဘူး။
+
+ပွဲတက်ရောက်ရန် စိတ်ဝင်စားပါက Messenger မှာ "Launch" လို့ စာတိုပေးပို့ပြီး အမြန်ဆုံး ကြိုတင်စာရင်းပေးလိုက်ပါ။
+
+#GeniusAutoWriterLaunch
+#MOT
+#ContentGenerator
+#EventAnnouncement
+#MyanmarBusiness
+#DigitalMarketingMyanmar
+#ContentStrategy
+#NewProduct
+---
+""",
+    'educational': """
+EXAMPLE REFERENCE (Follow this style and format):
+---
+📣 Content ရေးသားမှုကို အဆင့်မြှင့်တင်ဖို့ Genius Auto Writer ကို ဘယ်လို ထိထိရောက်ရောက် သုံးမလဲ? (Step-by-Step Guide) 💡
+
+Page အတွက် Quality ကောင်းတဲ့ Content တွေကို အချိန်ကုန်သက်သာစွာ ထုတ်ယူချင်သူတွေအတွက် MOT ရဲ့ "Genius Auto Writer" Content Generator ဟာ အကောင်းဆုံး tool တစ်ခုပါ။
+
+Genius Auto Writer အသုံးပြုနည်း အဆင့် (၃) ဆင့်:
+
+အဆင့် ၁။ Content Purpose ကို ရွေးပါ 🎯
+
+Genius Auto Writer ကို စတင်အသုံးပြုတာနဲ့ အရင်ဆုံး သင့် Content ရဲ့ ရည်ရွယ်ချက် (Purpose) ကို ရွေးချယ်ပေးရပါမယ်။
+
+• ကြော်ငြာ/Promotion: ပစ္စည်းအသစ် မိတ်ဆက်တာ၊ Discount ပေးတာမျိုးတွေအတွက်။
+• Engagement: Comment, Like, Share များဖို့ မေးခွန်းထုတ်တာ၊ ဂိမ်းဆော့ခိုင်းတာမျိုး။
+• Announcement/Update: သတင်း၊ အစီအစဉ် အသစ်တွေ ကြေညာဖို့။
+
+အဆင့် ၂။ Key Information တွေကို ထည့်သွင်းပါ ⌨️
+
+ဒါက အရေးအကြီးဆုံး အပိုင်းပါ။ သင်ထုတ်ယူချင်တဲ့ Content နဲ့ ပတ်သက်တဲ့ အချက်အလက် (Key Information) တွေကို တိတိကျကျ ရိုက်ထည့်ပေးရပါမယ်။
+
+• ထုတ်ကုန်/ဝန်ဆောင်မှု နာမည်: (ဥပမာ: MOT Digital Course)
+• ထူးခြားချက်/အကျိုးကျေးဇူး: (ဥပမာ: တစ်လအတွင်း Sale တက်စေမယ့် နည်းဗျူဟာ)
+• Target Audience: (ဥပမာ: အွန်လိုင်းစီးပွားရေး လုပ်ငန်းရှင်များ)
+
+အဆင့် ၃။ Generate ကို နှိပ်ပြီး ချက်ချင်း အသုံးပြုပါ ✅
+
+အဆင့် (၁) နဲ့ (၂) မှာ လိုအပ်တဲ့ အချက်အလက်တွေ ဖြည့်ပြီးတာနဲ့ "Generate" ခလုတ်ကို နှိပ်လိုက်ပါ။ စက္ကန့်ပိုင်းအတွင်းမှာ Facebook™️ Page မှာ တိုက်ရိုက်ယူသုံးလို့ရတဲ့ Content ကို ရရှိပါလိမ့်မယ်။
+
+#ContentWritingTips #DigitalMarketingMyanmar #GeniusAutoWriter
+---
+""",
+    'showcase': """
+EXAMPLE REFERENCE (Follow this style and format):
+---
+⚡️ Content ရေးသားမှုကို စက္ကန့်ပိုင်းအတွင်း အပြီးသတ်ပေးမယ့် Genius Auto Writer ရဲ့ Live Demo! 🚀
+
+Page Admin တွေ၊ Content Creator တွေ စိတ်ပူနေရတဲ့ "Content Quality" နဲ့ "အချိန်ကုန်သက်သာမှု" ဆိုတဲ့ ပြဿနာနှစ်ခုကို MOT ရဲ့ Genius Auto Writer နဲ့ ဘယ်လို ဖြေရှင်းနိုင်လဲဆိုတာ ဒီနေ့ လက်တွေ့ပြသသွားပါမယ်။
+
+Genius Auto Writer က AI စနစ်မဟုတ်ဘဲ၊ Content ပညာရှင်တွေရဲ့ ရေးသားမှုပုံစံနဲ့ Facebook™️ Trend တွေကို အခြေခံပြီး တည်ဆောက်ထားတဲ့ MOT ရဲ့ ကိုယ်ပိုင် Generator ဖြစ်ပါတယ်။
+
+Genius Auto Writer ရဲ့ 'Premium Quality' Output ကို ကြည့်လိုက်ပါ! 👀
+
+ဥပမာအနေနဲ့၊ ကျွန်တော်တို့ရဲ့ Product အသစ်ဖြစ်တဲ့ 'MOT Sales Booster Course' အတွက် Promotion Content တစ်ခု လိုချင်တယ်ဆိုပါစို့။
+
+Inputs (ထည့်သွင်းရမယ့် အချက်အလက်များ):
+
+1. Content Purpose: Promotion / Course Sales
+2. Product Name: MOT Sales Booster Course
+3. Key Benefits:
+   • တစ်ပတ်အတွင်း Sales 100% တက်စေမယ့် လျှို့ဝှက်ချက်
+   • Target Audience ကို စနစ်တကျ ရှာဖွေနည်း
+   • လက်တွေ့ အကောင်အထည်ဖော်ရုံပဲ လိုတဲ့ Practical Strategy တွေ
+
+Output (Genius Auto Writer က ထုတ်ပေးမယ့် Content ပုံစံ):
+
+✨ ခေါင်းစဉ်: ❌ Sale တွေကျလို့ စိတ်ညစ်မနေပါနဲ့! ၇ ရက်အတွင်း ၁၀၀% တိုးတက်စေမယ့် လျှို့ဝှက်ချက်!
+
+📈 စာကိုယ် (Body):
+Online Business လုပ်ငန်းရှင်တွေအတွက် Sale ပိုတက်ဖို့ ခေါင်းစားနေရပြီလား? MOT Sales Booster Course ကို စတင်လိုက်ပါ။ ဒီ Course က တခြား Course တွေလို သီအိုရီတွေချည်း မဟုတ်ဘဲ၊ လက်တွေ့အသုံးချနိုင်မယ့် Practical Strategy တွေကိုပဲ အဓိကထား သင်ပေးမှာပါ။
+
+➡️ CTA: အချိန်မဆွဲပါနဲ့၊ ဒီနေ့ပဲ စာရင်းသွင်းပြီး သင်တန်းကြေး Discount ရယူလိုက်ပါ။
+
+#GeniusAutoWriterDemo #MOTTech #ContentTool #ProductShowcase
+---
+"""
+}
+
+_PURPOSE_DESCRIPTIONS = {
+    'informative': 'Provide useful information and insights',
+    'engagement': 'Encourage audience interaction and engagement',
+    'sales': 'Promote and sell products or services',
+    'emotional': 'Create emotional connection and feelings',
+    'announcement': 'Announce events, updates, or news',
+    'educational': 'Teach and educate the audience',
+    'showcase': 'Showcase product features and benefits'
+}
+
+for _key, _description in _PURPOSE_DESCRIPTIONS.items():
+    register_purpose(_key, _description, _STYLE_EXAMPLES.get(_key, ''))
+
+
+TEXT_PROMPT = PromptTemplate('text', """You are a 10 years experience social media content writer. Directly generate a social media post. Do not include any introductory phrases, explanations, or preambles. {language_instruction}{emoji_instruction}
+
+{style_example}
+
+IMPORTANT: Use the example above as a REFERENCE for style, format, structure, and tone. DO NOT copy the example content. Create NEW and ORIGINAL content based on the topic and requirements below, but follow the same writing style, formatting patterns, and engagement approach shown in the example.
+
+Page/Brand Name: {page_name}
+Topic: {prompt}
+Purpose: {purpose_text}
+Writing Style: {writing_style}
+Target Audience: {audience}
+Word Count: Approximately {word_count} words
+Keywords to include: {keywords}
+Hashtags to include: {hashtags}
+Call to Action: {cta}
+Avoid/Don't include: {negative_constraints}
+        """)
+
+VOICE_PROMPT = PromptTemplate('voice', """CRITICAL INSTRUCTION: You MUST listen carefully to the audio recording and create content based EXACTLY on what you hear in the audio. DO NOT generate generic or unrelated content.
+
+You are a 10 years experience social media content writer. Listen to the provided audio recording and analyze the EXACT content, tone, and context spoken in the audio. Generate a social media post that directly reflects what was said in the audio. Do not include any introductory phrases, explanations, or preambles. {language_instruction}{emoji_instruction}
+
+{style_example}
+
+IMPORTANT: Use the example above as a REFERENCE for style, format, structure, and tone. DO NOT copy the example content. Create NEW and ORIGINAL content based on the audio recording and requirements below, but follow the same writing style, formatting patterns, and engagement approach shown in the example.
+
+Page/Brand Name: {page_name}
+Purpose: {purpose_text}
+Writing Style: {writing_style}
+Target Audience: {audience}
+Word Count: Approximately {word_count} words
+Keywords to include: {keywords}
+Hashtags to include: {hashtags}
+Call to Action: {cta}
+Avoid/Don't include: {negative_constraints}
+
+IMPORTANT: The content MUST be based on the audio recording. Listen to what is actually said and create content about that specific topic. If the audio talks about food, write about food. If it talks about business, write about business. Match the audio content exactly.""")
+
+PROMPTS = {
+    'text': TEXT_PROMPT,
+    'voice': VOICE_PROMPT
+}
+
+
+@lru_cache(maxsize=64)
+def emoji_instruction(include_emojis, word_count):
+    """Emoji guidance for the prompt, scaled to the requested word count"""
+    if not include_emojis:
+        return NO_EMOJI_INSTRUCTION
+
+    word_count_int = int(word_count) if word_count.isdigit() else 300
+    if word_count_int <= 100:
+        emoji_count = "1-2"
+    elif word_count_int <= 200:
+        emoji_count = "2-4"
+    else:
+        emoji_count = "3-6"
+    return EMOJI_INSTRUCTION.render({'emoji_count': emoji_count, 'word_count': str(word_count_int)})
+
+
+def _compiled_prompt(kind, purpose, language):
+    """Prompt template with the purpose- and language-specific text baked in"""
+    compiled = _compiled_prompts.get((kind, purpose, language))
+    if compiled is None:
+        registered = PURPOSES.get(purpose)
+        compiled = PROMPTS[kind].partial(f"{kind}:{purpose}:{language}", {
+            'language_instruction': LANGUAGE_INSTRUCTIONS.get(language, DEFAULT_LANGUAGE_INSTRUCTION),
+            'style_example': registered.example if registered else '',
+            'purpose_text': registered.description if registered else (purpose if purpose else 'General content')
+        })
+        # Only cache known keys so free-form values can't grow the table
+        if (registered or not purpose) and language in LANGUAGE_INSTRUCTIONS:
+            _compiled_prompts[(kind, purpose, language)] = compiled
+    return compiled
+
+
+def render_prompt(kind, page_name, prompt, purpose, writing_style, audience, word_count,
+                  keywords, hashtags, cta, negative_constraints, language, include_emojis):
+    """Render the 'text' or 'voice' generation prompt for the given form fields"""
+    return _compiled_prompt(kind, purpose, language).render({
+        'emoji_instruction': emoji_instruction(include_emojis, word_count),
+        'page_name': page_name,
+        'prompt': prompt,
+        'writing_style': writing_style,
+        'audience': audience,
+        'word_count': word_count,
+        'keywords': keywords,
+        'hashtags': hashtags,
+        'cta': cta,
+        'negative_constraints': negative_constraints
+    })
+
+
+# Precompile the prompts for every registered purpose/language at import
+for _kind in PROMPTS:
+    for _purpose in list(PURPOSES) + ['']:
+        for _language in LANGUAGE_INSTRUCTIONS:
+            _compiled_prompt(_kind, _purpose, _language)
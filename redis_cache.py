@@ -1,15 +1,287 @@
 import os
 import json
+import math
+import zlib
+import base64
+import time
+import uuid
+import random
+import bisect
+import fnmatch
 import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from functools import wraps
 from flask import request
-from upstash_redis import Redis
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
 
 # Initialize Redis client
 redis_client = None
 
-def init_redis():
-    """Initialize Redis client"""
+# Circuit breaker: after BREAKER_FAILURES consecutive failed/slow calls, skip
+# Redis entirely for BREAKER_COOLDOWN seconds, then let a single probe through
+BREAKER_FAILURES = int(os.getenv('CACHE_BREAKER_FAILURES', '5'))
+BREAKER_COOLDOWN = float(os.getenv('CACHE_BREAKER_COOLDOWN', '30'))  # seconds
+CALL_TIMEOUT = float(os.getenv('CACHE_CALL_TIMEOUT', '1.0'))  # seconds per Redis call, 0 = no budget
+REST_RETRIES = int(os.getenv('CACHE_REST_RETRIES', '0'))
+
+class CircuitBreaker:
+    """Closed -> open after consecutive failures -> half-open probe -> closed"""
+    
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+    
+    def __init__(self, failure_threshold, cooldown):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_started = None
+        self._lock = threading.Lock()
+        self._stats = {'opened': 0, 'half_opened': 0, 'closed': 0, 'short_circuited': 0, 'failures': 0}
+    
+    def allow(self):
+        """Whether a Redis call may be attempted now"""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and time.monotonic() - self._opened_at >= self.cooldown:
+                self.state = self.HALF_OPEN
+                self._stats['half_opened'] += 1
+                logging.info("Redis circuit half-open, probing")
+            # One probe at a time; a probe that never reported back is given up on
+            now = time.monotonic()
+            if self.state == self.HALF_OPEN and (self._probe_started is None or now - self._probe_started >= self.cooldown):
+                self._probe_started = now
+                return True
+            self._stats['short_circuited'] += 1
+            return False
+    
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._probe_started = None
+            if self.state != self.CLOSED:
+                self.state = self.CLOSED
+                self._stats['closed'] += 1
+                logging.info("Redis circuit closed")
+    
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._stats['failures'] += 1
+            self._probe_started = None
+            if self.state == self.HALF_OPEN or (self.state == self.CLOSED and self._failures >= self.failure_threshold):
+                self.state = self.OPEN
+                self._opened_at = time.monotonic()
+                self._stats['opened'] += 1
+                logging.warning(f"Redis circuit open for {self.cooldown}s after {self._failures} failures")
+    
+    def get_stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['state'] = self.state
+            stats['consecutive_failures'] = self._failures
+            stats['failure_threshold'] = self.failure_threshold
+            stats['cooldown'] = self.cooldown
+            return stats
+
+breaker = CircuitBreaker(BREAKER_FAILURES, BREAKER_COOLDOWN)
+_call_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix='redis-call') if CALL_TIMEOUT else None
+
+def _redis_available():
+    """Redis is configured and the breaker lets this call through"""
+    return redis_client is not None and breaker.allow()
+
+def _redis_call(func, *args, **kwargs):
+    """Run a Redis command within CALL_TIMEOUT and report the outcome to the breaker"""
+    try:
+        if _call_executor:
+            result = _call_executor.submit(func, *args, **kwargs).result(timeout=CALL_TIMEOUT)
+        else:
+            result = func(*args, **kwargs)
+    except Exception:
+        breaker.record_failure()
+        raise
+    breaker.record_success()
+    return result
+
+# L1: small in-process LRU in front of Upstash. Its TTL bounds how long another
+# process can serve a value after invalidation, so keep it short.
+L1_MAX_ENTRIES = int(os.getenv('CACHE_L1_MAX_ENTRIES', '1024'))
+L1_TTL = int(os.getenv('CACHE_L1_TTL', '10'))  # seconds
+
+# Value codec. Payloads start with a two-character header: codec (J = UTF-8
+# JSON, M = msgpack) and compression (- = none, z = zlib, s = zstd). Anything
+# without a header is a legacy json.dumps payload and is still readable, so
+# codec settings can change during a rollout.
+CACHE_CODEC = os.getenv('CACHE_CODEC', 'json').lower()  # json or msgpack
+CACHE_COMPRESSION = os.getenv('CACHE_COMPRESSION', 'zlib').lower()  # none, zlib or zstd
+CACHE_COMPRESS_MIN_BYTES = int(os.getenv('CACHE_COMPRESS_MIN_BYTES', '1024'))
+
+if CACHE_CODEC == 'msgpack' and msgpack is None:
+    logging.warning("CACHE_CODEC=msgpack but msgpack is not installed, using json")
+    CACHE_CODEC = 'json'
+if CACHE_COMPRESSION == 'zstd' and zstandard is None:
+    logging.warning("CACHE_COMPRESSION=zstd but zstandard is not installed, using zlib")
+    CACHE_COMPRESSION = 'zlib'
+
+def _compress(method, data):
+    if method == 's':
+        return zstandard.ZstdCompressor().compress(data)
+    return zlib.compress(data, 6)
+
+def _decompress(method, data):
+    if method == 's':
+        return zstandard.ZstdDecompressor().decompress(data)
+    return zlib.decompress(data)
+
+def encode_value(value):
+    """Serialize a value into a headered cache payload (a str, as Upstash REST stores text)"""
+    if CACHE_CODEC == 'msgpack':
+        codec, data = 'M', msgpack.packb(value, use_bin_type=True)
+    else:
+        codec, data = 'J', json.dumps(value, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    
+    if CACHE_COMPRESSION != 'none' and len(data) >= CACHE_COMPRESS_MIN_BYTES:
+        method = 's' if CACHE_COMPRESSION == 'zstd' else 'z'
+        compressed = _compress(method, data)
+        # Base64 costs a third, so only keep compression when it still wins
+        if len(compressed) * 4 // 3 < len(data):
+            return codec + method + base64.b64encode(compressed).decode('ascii')
+    
+    if codec == 'J':
+        return 'J-' + data.decode('utf-8')
+    return 'M-' + base64.b64encode(data).decode('ascii')
+
+def decode_value(payload):
+    """Deserialize a cache payload written by encode_value (or a legacy JSON payload)"""
+    codec = payload[:1]
+    if codec not in ('J', 'M') or payload[1:2] not in ('-', 'z', 's'):
+        return json.loads(payload)
+    
+    method, body = payload[1], payload[2:]
+    if codec == 'J' and method == '-':
+        return json.loads(body)
+    
+    data = base64.b64decode(body)
+    if method != '-':
+        data = _decompress(method, data)
+    if codec == 'M':
+        return msgpack.unpackb(data, raw=False)
+    return json.loads(data)
+
+class LocalLRUCache:
+    """Thread-safe LRU with per-entry expiry, holding serialized values"""
+    
+    def __init__(self, max_entries, default_ttl):
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+        self._entries = OrderedDict()  # key -> (expires_at, payload)
+        self._lock = threading.Lock()
+    
+    def get(self, key):
+        """Return the stored payload, or None if missing/expired"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+    
+    def set(self, key, payload, ttl=None):
+        ttl = self.default_ttl if ttl is None else min(ttl, self.default_ttl)
+        if ttl <= 0 or self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, payload)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+    
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+    
+    def delete_matching(self, pattern):
+        """Drop every entry whose key matches a glob pattern"""
+        with self._lock:
+            for key in [k for k in self._entries if fnmatch.fnmatchcase(k, pattern)]:
+                del self._entries[key]
+    
+    def __len__(self):
+        return len(self._entries)
+
+l1_cache = LocalLRUCache(L1_MAX_ENTRIES, L1_TTL)
+
+# Client-side counters: where reads were served from
+_stats_lock = threading.Lock()
+_read_stats = {'l1_hits': 0, 'l2_hits': 0, 'misses': 0}
+
+# Per key-prefix counters (the part of the key before the first ':') with
+# get/set latency histograms, so individual pages can be judged on their own
+LATENCY_BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500)
+_prefix_stats = {}
+
+def _prefix_entry(key):
+    """Counters for the key's prefix (_stats_lock held)"""
+    prefix = key.split(':', 1)[0]
+    entry = _prefix_stats.get(prefix)
+    if entry is None:
+        entry = _prefix_stats[prefix] = {
+            'l1_hits': 0, 'l2_hits': 0, 'misses': 0, 'sets': 0, 'errors': 0,
+            'bytes_read': 0, 'bytes_written': 0,
+            'get_latency': [0] * (len(LATENCY_BUCKETS_MS) + 1), 'get_latency_sum_ms': 0.0,
+            'set_latency': [0] * (len(LATENCY_BUCKETS_MS) + 1), 'set_latency_sum_ms': 0.0
+        }
+    return entry
+
+def _count(stat, key, nbytes=0):
+    """Count a read outcome (l1_hits, l2_hits, misses) or error for key"""
+    with _stats_lock:
+        if stat in _read_stats:
+            _read_stats[stat] += 1
+        entry = _prefix_entry(key)
+        entry[stat] += 1
+        entry['bytes_read'] += nbytes
+
+def _count_set(key, nbytes):
+    with _stats_lock:
+        entry = _prefix_entry(key)
+        entry['sets'] += 1
+        entry['bytes_written'] += nbytes
+
+def _observe(op, key, started):
+    """Record the latency of a get/set on key that began at perf_counter() started"""
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    with _stats_lock:
+        entry = _prefix_entry(key)
+        entry[f'{op}_latency'][bisect.bisect_left(LATENCY_BUCKETS_MS, elapsed_ms)] += 1
+        entry[f'{op}_latency_sum_ms'] += elapsed_ms
+
+def init_redis(ping=False):
+    """Initialize Redis client
+    
+    Building the REST client makes no network call, so by default startup
+    doesn't ping Upstash (that round-trip would land on every serverless cold
+    start); a broken connection shows up on first use and trips the breaker.
+    Pass ping=True to check the connection up front.
+    """
     global redis_client
     
     # # TEMPORARILY DISABLED FOR DEBUGGING
@@ -23,9 +295,11 @@ def init_redis():
     
     if redis_url and redis_token:
         try:
-            redis_client = Redis(url=redis_url, token=redis_token)
-            # Test connection
-            redis_client.ping()
+            from upstash_redis import Redis
+            # Fail fast and let the breaker handle outages instead of the client's retry sleep
+            redis_client = Redis(url=redis_url, token=redis_token, rest_retries=REST_RETRIES)
+            if ping:
+                redis_client.ping()
             logging.info("✅ Redis cache initialized successfully")
             return True
         except Exception as e:
@@ -43,120 +317,576 @@ def cache_key(prefix, *args, **kwargs):
     key_parts.extend(f"{k}={v}" for k, v in sorted(kwargs.items()))
     return ":".join(key_parts)
 
-def get_cache(key):
-    """Get value from cache"""
-    if not redis_client:
+def _user_version_key(user_id):
+    """Key holding the cache namespace version for a user (never expires)"""
+    return f"cachever:{user_id}"
+
+def get_user_cache_version(user_id):
+    """Get the current cache namespace version for a user (L1-cached)"""
+    version_key = _user_version_key(user_id)
+    version = l1_cache.get(version_key)
+    if version is not None:
+        return version
+    if not _redis_available():
+        return 0
+    
+    try:
+        version = _redis_call(redis_client.get, version_key)
+        version = int(version) if version else 0
+        l1_cache.set(version_key, version)
+        return version
+    except Exception as e:
+        logging.error(f"Cache version get error: {e}")
+        return 0
+
+def user_cache_key(prefix, user_id, *args, **kwargs):
+    """Generate a per-user cache key inside the user's versioned namespace
+    
+    Keys look like ``dashboard:{user_id}:v{n}:...``. Bumping the version in
+    invalidate_user_cache makes every older key unreachable; those entries
+    then simply age out through their TTL.
+    """
+    namespace = f"{prefix}:{user_id}:v{get_user_cache_version(user_id)}"
+    return cache_key(namespace, *args, **kwargs)
+
+def get_cache(key, use_l1=True):
+    """Get value from cache (in-process L1 first, then Redis)
+    
+    Pass use_l1=False for values other processes update and that must not be
+    served stale, e.g. job state.
+    """
+    started = time.perf_counter()
+    if use_l1:
+        payload = l1_cache.get(key)
+        if payload is not None:
+            _count('l1_hits', key, len(payload))
+            _observe('get', key, started)
+            return decode_value(payload)
+    
+    if not _redis_available():
+        _count('misses', key)
         return None
     
     try:
-        value = redis_client.get(key)
+        value = _redis_call(redis_client.get, key)
+        _observe('get', key, started)
         if value:
-            return json.loads(value)
+            _count('l2_hits', key, len(value))
+            if use_l1:
+                l1_cache.set(key, value)
+            return decode_value(value)
+        _count('misses', key)
         return None
     except Exception as e:
+        _count('errors', key)
         logging.error(f"Cache get error: {e}")
         return None
 
-def set_cache(key, value, expire=300):
-    """Set value in cache with expiration (seconds)"""
-    if not redis_client:
+def set_cache(key, value, expire=300, use_l1=True):
+    """Set value in cache with expiration (seconds)
+    
+    Returns True once the value is stored in Redis; the L1 copy is best-effort.
+    """
+    started = time.perf_counter()
+    payload = encode_value(value)
+    _count_set(key, len(payload))
+    if use_l1:
+        l1_cache.set(key, payload, expire)
+    
+    if not _redis_available():
         return False
     
     try:
-        redis_client.set(key, json.dumps(value), ex=expire)
+        _redis_call(redis_client.set, key, payload, ex=expire)
+        _observe('set', key, started)
         return True
     except Exception as e:
+        _count('errors', key)
         logging.error(f"Cache set error: {e}")
         return False
 
-def delete_cache(key):
-    """Delete key from cache"""
-    if not redis_client:
+def delete_cache(*keys):
+    """Delete one or more keys from cache (one DEL)"""
+    for key in keys:
+        l1_cache.delete(key)
+    if not _redis_available():
         return False
     
     try:
-        redis_client.delete(key)
+        _redis_call(redis_client.delete, *keys)
         return True
     except Exception as e:
         logging.error(f"Cache delete error: {e}")
         return False
 
-def delete_pattern(pattern):
-    """Delete all keys matching pattern"""
-    if not redis_client:
+def delete_pattern(pattern, batch_size=500):
+    """Delete all keys matching pattern
+    
+    Walks the keyspace with cursor-based SCAN (never KEYS, which blocks Redis
+    for O(N) over the whole keyspace) and deletes matches batch by batch.
+    Prefer invalidate_user_cache for per-user data; this is for explicit
+    cleanups only.
+    """
+    l1_cache.delete_matching(pattern)
+    if not _redis_available():
         return False
     
     try:
-        # Get all keys matching pattern
-        keys = redis_client.keys(pattern)
-        if keys:
-            redis_client.delete(*keys)
+        cursor = 0
+        while True:
+            cursor, keys = _redis_call(redis_client.scan, cursor, match=pattern, count=batch_size)
+            if keys:
+                _redis_call(redis_client.delete, *keys)
+            if int(cursor) == 0:
+                break
         return True
     except Exception as e:
         logging.error(f"Cache pattern delete error: {e}")
         return False
 
-def cached(prefix, expire=300, key_func=None):
+def get_many(keys, use_l1=True):
+    """Get several values in one round-trip
+    
+    Keys found in L1 are served locally; the rest are fetched with a single
+    MGET. Returns a dict of key -> value for hits only.
+    """
+    started = time.perf_counter()
+    found = {}
+    remote_keys = []
+    for key in keys:
+        payload = l1_cache.get(key) if use_l1 else None
+        if payload is not None:
+            _count('l1_hits', key, len(payload))
+            found[key] = decode_value(payload)
+        else:
+            remote_keys.append(key)
+    
+    if not remote_keys:
+        return found
+    if not _redis_available():
+        for key in remote_keys:
+            _count('misses', key)
+        return found
+    
+    try:
+        values = _redis_call(redis_client.mget, *remote_keys)
+    except Exception as e:
+        for key in remote_keys:
+            _count('errors', key)
+        logging.error(f"Cache mget error: {e}")
+        return found
+    
+    # Every key shared the one round-trip
+    for key, value in zip(remote_keys, values):
+        _observe('get', key, started)
+        if value:
+            _count('l2_hits', key, len(value))
+            if use_l1:
+                l1_cache.set(key, value)
+            found[key] = decode_value(value)
+        else:
+            _count('misses', key)
+    return found
+
+def set_many(mapping, expire=300, use_l1=True):
+    """Set several values in one round-trip (Upstash pipeline)
+    
+    Returns True once all values are stored in Redis.
+    """
+    if not mapping:
+        return True
+    
+    started = time.perf_counter()
+    payloads = {key: encode_value(value) for key, value in mapping.items()}
+    for key, payload in payloads.items():
+        _count_set(key, len(payload))
+        if use_l1:
+            l1_cache.set(key, payload, expire)
+    
+    if not _redis_available():
+        return False
+    
+    try:
+        pipeline = redis_client.pipeline()
+        for key, payload in payloads.items():
+            pipeline.set(key, payload, ex=expire)
+        _redis_call(pipeline.exec)
+        for key in payloads:
+            _observe('set', key, started)
+        return True
+    except Exception as e:
+        for key in payloads:
+            _count('errors', key)
+        logging.error(f"Cache pipeline set error: {e}")
+        return False
+
+def incr_counters(keys, expire):
+    """Increment integer counters and refresh their TTL in one round-trip
+    
+    Counters are plain Redis integers (no codec, no L1). Returns the new
+    values in key order, or None when Redis is unavailable so callers can
+    fall back to local counting.
+    """
+    if not _redis_available():
+        return None
+    
+    started = time.perf_counter()
+    try:
+        pipeline = redis_client.pipeline()
+        for key in keys:
+            pipeline.incr(key)
+            pipeline.expire(key, expire)
+        results = _redis_call(pipeline.exec)
+    except Exception as e:
+        for key in keys:
+            _count('errors', key)
+        logging.error(f"Cache counter incr error: {e}")
+        return None
+    for key in keys:
+        _observe('set', key, started)
+    return [int(value) for value in results[::2]]
+
+def get_counters(keys):
+    """Read integer counters with one MGET (missing keys count as 0)
+    
+    Returns the values in key order, or None when Redis is unavailable.
+    """
+    if not _redis_available():
+        return None
+    
+    started = time.perf_counter()
+    try:
+        values = _redis_call(redis_client.mget, *keys)
+    except Exception as e:
+        for key in keys:
+            _count('errors', key)
+        logging.error(f"Cache counter mget error: {e}")
+        return None
+    for key in keys:
+        _observe('get', key, started)
+    return [int(value) if value else 0 for value in values]
+
+def cached_many(expire=300):
+    """
+    Decorator for loaders that fill several cache keys at once
+    
+    The decorated function is called with a dict of name -> cache key (plus
+    any extra arguments) and returns a dict of name -> value. All keys are read
+    with one MGET; the wrapped loader only receives the names that missed and
+    returns their values, which are written back in one pipeline.
+    
+    Args:
+        expire: Expiration time in seconds (default: 5 minutes)
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(keys, *args, **kwargs):
+            found = get_many(list(keys.values()))
+            values = {name: found[key] for name, key in keys.items() if key in found}
+            
+            missing = [name for name in keys if name not in values]
+            if missing:
+                logging.debug(f"Cache MISS: {', '.join(keys[name] for name in missing)}")
+                loaded = f(missing, *args, **kwargs)
+                set_many({keys[name]: loaded[name] for name in missing}, expire)
+                values.update(loaded)
+            
+            return values
+        
+        return decorated_function
+    return decorator
+
+# Striped in-process locks for single-flight recomputation in `cached`
+_recompute_locks = [threading.Lock() for _ in range(64)]
+
+def _recompute_lock(key):
+    return _recompute_locks[hash(key) % len(_recompute_locks)]
+
+def _acquire_redis_lock(key, ttl_ms):
+    """Try to take a short cross-process lock (SET NX PX); returns a token or None
+    
+    Without Redis (or if Redis errors) there is nothing to coordinate with, so
+    the caller is allowed to proceed.
+    """
+    if not _redis_available():
+        return 'local'
+    
+    token = uuid.uuid4().hex
+    try:
+        if _redis_call(redis_client.set, f"lock:{key}", token, px=ttl_ms, nx=True):
+            return token
+        return None
+    except Exception as e:
+        logging.error(f"Cache lock error: {e}")
+        return 'local'
+
+def _release_redis_lock(key, token):
+    """Release a lock taken with _acquire_redis_lock if we still own it"""
+    if token == 'local' or not _redis_available():
+        return
+    
+    try:
+        if _redis_call(redis_client.get, f"lock:{key}") == token:
+            _redis_call(redis_client.delete, f"lock:{key}")
+    except Exception as e:
+        logging.error(f"Cache unlock error: {e}")
+
+def _is_envelope(entry):
+    return isinstance(entry, dict) and entry.get('__cached__') == 1
+
+def _wait_for_fill(key, timeout):
+    """Poll Redis for up to timeout seconds for a fresh value another worker is computing"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        time.sleep(0.05)
+        entry = get_cache(key, use_l1=False)
+        if _is_envelope(entry) and time.time() < entry['expires']:
+            return entry
+    return None
+
+def cached(prefix, expire=300, key_func=None, stale_ttl=60, beta=1.0, lock_timeout=10):
     """
     Decorator to cache function results
     
+    Protects hot keys from stampedes when they expire:
+      * single-flight: one recomputation per key, coordinated by an
+        in-process lock plus a short Redis lock (SET NX PX) across processes
+      * probabilistic early refresh (XFetch): a caller may recompute shortly
+        before expiry, with a probability that grows as expiry approaches and
+        with how long the value took to compute
+      * stale-while-revalidate: for stale_ttl seconds after expiry, callers
+        that don't win the lock get the previous value instead of waiting
+    
     Args:
         prefix: Cache key prefix
         expire: Expiration time in seconds (default: 5 minutes)
         key_func: Function to generate cache key (optional)
+        stale_ttl: Seconds a stale value may still be served while refreshing
+        beta: XFetch aggressiveness (> 1 refreshes earlier, 0 disables)
+        lock_timeout: Max seconds to wait for another worker's recomputation
+    
+    The decorated function gets a refresh(*args, **kwargs) attribute that
+    recomputes the value under the same locks, e.g. from a background thread.
     """
     def decorator(f):
+        def make_key(args, kwargs):
+            if key_func:
+                return key_func(*args, **kwargs)
+            return cache_key(prefix, *args, **kwargs)
+        
+        def compute(key, args, kwargs, token):
+            """Call f and store its result, releasing the Redis lock afterwards"""
+            logging.debug(f"Cache MISS: {key}")
+            started = time.time()
+            try:
+                result = f(*args, **kwargs)
+                finished = time.time()
+                
+                # Store in cache, kept physically for the stale window too
+                set_cache(key, {
+                    '__cached__': 1,
+                    'value': result,
+                    'delta': finished - started,
+                    'expires': finished + expire
+                }, expire + stale_ttl)
+            finally:
+                if token:
+                    _release_redis_lock(key, token)
+            
+            return result
+        
         @wraps(f)
         def decorated_function(*args, **kwargs):
-            # Generate cache key
-            if key_func:
-                key = key_func(*args, **kwargs)
-            else:
-                key = cache_key(prefix, *args, **kwargs)
+            key = make_key(args, kwargs)
             
             # Try to get from cache
-            cached_value = get_cache(key)
-            if cached_value is not None:
+            entry = get_cache(key)
+            if entry is not None and not _is_envelope(entry):
+                # Plain value written before envelopes existed
                 logging.debug(f"Cache HIT: {key}")
-                return cached_value
+                return entry
             
-            # Cache miss - call function
-            logging.debug(f"Cache MISS: {key}")
-            result = f(*args, **kwargs)
+            stale_value = None
+            if entry is not None:
+                now = time.time()
+                early_by = -entry['delta'] * beta * math.log(random.random() or 1e-12)
+                if now + early_by < entry['expires']:
+                    logging.debug(f"Cache HIT: {key}")
+                    return entry['value']
+                stale_value = entry
             
-            # Store in cache
-            set_cache(key, result, expire)
+            lock = _recompute_lock(key)
+            if stale_value is not None:
+                # Someone else is already refreshing - serve the stale value
+                if not lock.acquire(blocking=False):
+                    return stale_value['value']
+            elif not lock.acquire(timeout=lock_timeout):
+                # The holder is slow - take its result if it lands, otherwise
+                # give it one more lock_timeout before computing without the lock
+                entry = _wait_for_fill(key, lock_timeout)
+                if entry is not None:
+                    return entry['value']
+                if not lock.acquire(timeout=lock_timeout):
+                    logging.warning(f"Cache recompute of {key} still running after {lock_timeout * 3}s, "
+                                    f"computing without the lock")
+                    return compute(key, args, kwargs, None)
             
-            return result
+            try:
+                if stale_value is None:
+                    # Another thread may have filled it while we waited
+                    entry = get_cache(key)
+                    if _is_envelope(entry) and time.time() < entry['expires']:
+                        return entry['value']
+                
+                token = _acquire_redis_lock(key, lock_timeout * 1000)
+                if token is None:
+                    if stale_value is not None:
+                        return stale_value['value']
+                    # Another process is computing it - wait briefly for its result
+                    entry = _wait_for_fill(key, lock_timeout)
+                    if entry is not None:
+                        return entry['value']
+                
+                return compute(key, args, kwargs, token)
+            finally:
+                lock.release()
+        
+        def refresh(*args, **kwargs):
+            """Recompute and store the value now, unless another worker already is
+            
+            Returns the new value, or None when the refresh was skipped.
+            """
+            key = make_key(args, kwargs)
+            lock = _recompute_lock(key)
+            if not lock.acquire(blocking=False):
+                return None
+            try:
+                token = _acquire_redis_lock(key, lock_timeout * 1000)
+                if token is None:
+                    return None
+                return compute(key, args, kwargs, token)
+            finally:
+                lock.release()
         
+        decorated_function.refresh = refresh
         return decorated_function
     return decorator
 
+# Per-user key prefixes built with user_cache_key
+USER_CACHE_PREFIXES = ('dashboard', 'content', 'stats', 'session')
+
 def invalidate_user_cache(user_id):
-    """Invalidate all cache for a specific user"""
-    patterns = [
-        f"dashboard:{user_id}:*",
-        f"content:{user_id}:*",
-        f"stats:{user_id}:*"
-    ]
+    """Invalidate all cache for a specific user
+    
+    A single INCR of the user's namespace version; keys built with
+    user_cache_key (dashboard/content/stats/session) under the old version are no
+    longer read, so write latency doesn't grow with the number of keys.
+    Local L1 entries for the user are dropped as well; other processes pick
+    up the new version within L1_TTL.
+    """
+    for prefix in USER_CACHE_PREFIXES:
+        l1_cache.delete_matching(f"{prefix}:{user_id}:*")
+    l1_cache.delete(_user_version_key(user_id))
+    
+    if not _redis_available():
+        return False
+    
+    try:
+        version = _redis_call(redis_client.incr, _user_version_key(user_id))
+        l1_cache.set(_user_version_key(user_id), int(version))
+        logging.info(f"Invalidated cache for user {user_id}")
+        return True
+    except Exception as e:
+        logging.error(f"Cache invalidation error: {e}")
+        return False
+
+def get_client_cache_stats():
+    """Get this process's L1/L2 read counters"""
+    with _stats_lock:
+        stats = dict(_read_stats)
+    reads = stats['l1_hits'] + stats['l2_hits'] + stats['misses']
+    stats['l1_hit_rate'] = round(stats['l1_hits'] / reads, 3) if reads else 0.0
+    stats['l2_hit_rate'] = round(stats['l2_hits'] / reads, 3) if reads else 0.0
+    stats['l1_entries'] = len(l1_cache)
+    stats['l1_max_entries'] = L1_MAX_ENTRIES
+    stats['l1_ttl'] = L1_TTL
+    stats['breaker'] = breaker.get_stats()
+    stats['prefixes'] = get_prefix_stats()
+    return stats
+
+def _snapshot_prefix_stats():
+    with _stats_lock:
+        return {prefix: dict(entry, get_latency=list(entry['get_latency']), set_latency=list(entry['set_latency']))
+                for prefix, entry in _prefix_stats.items()}
+
+def get_prefix_stats():
+    """Get this process's per-prefix counters with hit rates and average latencies"""
+    snapshot = _snapshot_prefix_stats()
+    
+    buckets = [str(bound) for bound in LATENCY_BUCKETS_MS] + ['+Inf']
+    for entry in snapshot.values():
+        reads = entry['l1_hits'] + entry['l2_hits'] + entry['misses']
+        entry['hit_rate'] = round((entry['l1_hits'] + entry['l2_hits']) / reads, 3) if reads else 0.0
+        for op in ('get', 'set'):
+            count = sum(entry[f'{op}_latency'])
+            entry[f'{op}_latency_avg_ms'] = round(entry[f'{op}_latency_sum_ms'] / count, 2) if count else 0.0
+            entry[f'{op}_latency_sum_ms'] = round(entry[f'{op}_latency_sum_ms'], 2)
+            entry[f'{op}_latency'] = dict(zip(buckets, entry[f'{op}_latency']))
+    return snapshot
+
+def render_metrics():
+    """Render client-side cache metrics in the Prometheus text exposition format"""
+    snapshot = _snapshot_prefix_stats()
+    
+    lines = []
+    counters = (
+        ('cache_l1_hits_total', 'l1_hits', 'Reads served from the in-process L1'),
+        ('cache_l2_hits_total', 'l2_hits', 'Reads served from Redis'),
+        ('cache_misses_total', 'misses', 'Reads that found nothing'),
+        ('cache_sets_total', 'sets', 'Values written'),
+        ('cache_errors_total', 'errors', 'Redis calls that failed'),
+        ('cache_read_bytes_total', 'bytes_read', 'Payload bytes read'),
+        ('cache_written_bytes_total', 'bytes_written', 'Payload bytes written')
+    )
+    for name, stat, help_text in counters:
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} counter")
+        for prefix, entry in sorted(snapshot.items()):
+            lines.append(f'{name}{{prefix="{prefix}"}} {entry[stat]}')
     
-    for pattern in patterns:
-        delete_pattern(pattern)
+    for op in ('get', 'set'):
+        name = f'cache_{op}_duration_seconds'
+        lines.append(f"# HELP {name} Cache {op} latency")
+        lines.append(f"# TYPE {name} histogram")
+        for prefix, entry in sorted(snapshot.items()):
+            cumulative = 0
+            for bound, count in zip(LATENCY_BUCKETS_MS + ('+Inf',), entry[f'{op}_latency']):
+                cumulative += count
+                le = bound if bound == '+Inf' else bound / 1000
+                lines.append(f'{name}_bucket{{prefix="{prefix}",le="{le}"}} {cumulative}')
+            lines.append(f'{name}_sum{{prefix="{prefix}"}} {entry[f"{op}_latency_sum_ms"] / 1000:.6f}')
+            lines.append(f'{name}_count{{prefix="{prefix}"}} {cumulative}')
     
-    logging.info(f"Invalidated cache for user {user_id}")
+    breaker_stats = breaker.get_stats()
+    lines.append("# HELP cache_breaker_open Whether the Redis circuit breaker is open (1) or half-open (0.5)")
+    lines.append("# TYPE cache_breaker_open gauge")
+    breaker_value = {'closed': 0, 'half_open': 0.5, 'open': 1}[breaker_stats['state']]
+    lines.append(f"cache_breaker_open {breaker_value}")
+    return '\n'.join(lines) + '\n'
 
 def get_cache_stats():
     """Get cache statistics"""
-    if not redis_client:
+    if not _redis_available():
         return None
     
     try:
-        info = redis_client.info()
+        info = _redis_call(redis_client.info)
         return {
             'hits': info.get('keyspace_hits', 0),
             'misses': info.get('keyspace_misses', 0),
-            'keys': redis_client.dbsize(),
-            'memory': info.get('used_memory_human', 'N/A')
+            'keys': _redis_call(redis_client.dbsize),
+            'memory': info.get('used_memory_human', 'N/A'),
+            'client': get_client_cache_stats()
         }
     except Exception as e:
         logging.error(f"Error getting cache stats: {e}")
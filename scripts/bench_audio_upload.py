@@ -0,0 +1,131 @@
+"""Compare the old tempfile round-trip for voice uploads with the in-memory path.
+
+Every round parses a real multipart/form-data body with werkzeug and reads the
+audio part back, so the spooling done by the form parser is included:
+
+  tempfile   default werkzeug Request (uploads over 500 KB spool to /tmp),
+             then the old save/reopen/read/unlink in the view
+  spooled    default werkzeug Request, read straight from the spooled file
+  in-memory  app.InMemoryUploadRequest, read with app.read_upload_capped
+
+Each variant runs in its own subprocess, and the peak RSS (VmHWM) is reset
+after the request body is built, so only the parse and read are counted. The
+reset needs Linux.
+
+Usage: python scripts/bench_audio_upload.py [size_mb] [rounds]
+"""
+import io
+import os
+import sys
+import json
+import time
+import shutil
+import tempfile
+import subprocess
+
+from werkzeug.test import EnvironBuilder
+from werkzeug.wrappers import Request
+
+LIMIT = 8 * 1024 * 1024
+VARIANTS = ('tempfile', 'spooled', 'in-memory')
+
+
+# The next two mirror app.py (kept standalone so this script doesn't need the
+# app's database/env configuration to import)
+class InMemoryUploadRequest(Request):
+    max_content_length = 10 * 1024 * 1024
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        return io.BytesIO()
+
+
+def read_upload_capped(stream, limit):
+    stream.seek(0, os.SEEK_END)
+    if stream.tell() > limit:
+        return None
+    if isinstance(stream, io.BytesIO):
+        return stream.getvalue()
+    stream.seek(0)
+    return stream.read()
+
+
+def tempfile_roundtrip(stream):
+    # What generate_content used to do: save, reopen, read, unlink
+    temp_audio = tempfile.NamedTemporaryFile(delete=False, suffix='.webm')
+    stream.seek(0)
+    shutil.copyfileobj(stream, temp_audio)
+    temp_audio.close()
+    with open(temp_audio.name, 'rb') as handle:
+        data = handle.read()
+    os.unlink(temp_audio.name)
+    return data
+
+
+def multipart_environ(size):
+    """WSGI environ for a form post with a size-byte webm; the body is built once"""
+    builder = EnvironBuilder(method='POST', data={
+        'pageName': 'Bench',
+        'audio': (io.BytesIO(os.urandom(size)), 'voice.webm', 'audio/webm'),
+    })
+    environ = builder.get_environ()
+    return environ, environ['wsgi.input'].read()
+
+
+def rss_kib(field):
+    with open('/proc/self/status') as status:
+        for line in status:
+            if line.startswith(field + ':'):
+                return int(line.split()[1])
+
+
+def reset_peak_rss():
+    with open('/proc/self/clear_refs', 'w') as clear_refs:
+        clear_refs.write('5')
+
+
+def run_variant(variant, size, rounds):
+    environ, body = multipart_environ(size)
+    request_class = InMemoryUploadRequest if variant == 'in-memory' else Request
+    reset_peak_rss()
+    baseline = rss_kib('VmRSS')
+    timings = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        request = request_class(dict(environ, **{'wsgi.input': io.BytesIO(body)}))
+        stream = request.files['audio'].stream
+        if variant == 'tempfile':
+            data = tempfile_roundtrip(stream)
+        else:
+            data = read_upload_capped(stream, LIMIT)
+        timings.append(time.perf_counter() - start)
+        assert len(data) == size
+        spooled = type(stream).__name__
+        request.close()
+        del data, request, stream
+    peak = rss_kib('VmHWM')
+    timings.sort()
+    print(json.dumps({
+        'variant': variant,
+        'stream': spooled,
+        'median_ms': timings[len(timings) // 2] * 1000,
+        'peak_rss_delta_kib': peak - baseline
+    }))
+
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] == '--variant':
+        run_variant(sys.argv[2], int(sys.argv[3]), int(sys.argv[4]))
+        return
+
+    size = int(float(sys.argv[1]) * 1024 * 1024) if len(sys.argv) > 1 else 5 * 1024 * 1024
+    rounds = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    print(f"{size / (1024 * 1024):.1f} MB upload in a multipart body, {rounds} rounds")
+    for variant in VARIANTS:
+        output = subprocess.check_output([sys.executable, __file__, '--variant', variant, str(size), str(rounds)])
+        result = json.loads(output)
+        print(f"{result['variant']:<10} {result['stream']:<20} median {result['median_ms']:8.3f} ms   "
+              f"peak RSS +{result['peak_rss_delta_kib'] / 1024:6.1f} MiB")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+"""Benchmark login throughput through the password hashing pool by worker count.
+
+Simulates a login burst: a fixed number of request threads each verify a
+password through password_hashing.check_password. For every worker count the
+pool is rebuilt and the script reports logins/sec, p50/p95 latency and how
+many requests were shed with PasswordHashingBusy (429 in the app).
+
+Usage: python scripts/bench_login.py [logins] [request_threads] [workers,...]
+       BCRYPT_LOG_ROUNDS=10 python scripts/bench_login.py 200 32 1,2,4,8
+"""
+import os
+import sys
+import time
+import logging
+import importlib
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask_bcrypt import Bcrypt  # noqa: E402
+import password_hashing  # noqa: E402
+
+PASSWORD = 'correct horse battery staple'
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def run(workers, logins, request_threads):
+    """Rebuild the pool with workers threads and push logins through it"""
+    os.environ['PASSWORD_HASH_WORKERS'] = str(workers)
+    module = importlib.reload(password_hashing)
+    hasher = Bcrypt()
+    hasher._log_rounds = module.LOG_ROUNDS
+    module.init_password_hashing(hasher)
+    password_hash = module.hash_password(PASSWORD)
+
+    def login(_):
+        started = time.perf_counter()
+        try:
+            assert module.check_password(password_hash, PASSWORD)
+        except module.PasswordHashingBusy:
+            return None
+        return (time.perf_counter() - started) * 1000
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=request_threads) as pool:
+        results = list(pool.map(login, range(logins)))
+    elapsed = time.perf_counter() - started
+    module._executor.shutdown()
+
+    latencies = [ms for ms in results if ms is not None]
+    print(f"{workers:>7}  {len(latencies) / elapsed:>10.1f}  {percentile(latencies, 0.5):>8.1f}"
+          f"  {percentile(latencies, 0.95):>8.1f}  {results.count(None):>6}")
+
+
+def main():
+    logging.disable(logging.WARNING)  # one "queue full" line per shed request
+    logins = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    request_threads = int(sys.argv[2]) if len(sys.argv) > 2 else 32
+    worker_counts = [int(n) for n in sys.argv[3].split(',')] if len(sys.argv) > 3 else [1, 2, 4, 8]
+
+    print(f"{logins} logins from {request_threads} request threads, "
+          f"cost {password_hashing.LOG_ROUNDS}, {os.cpu_count()} CPUs")
+    print(f"{'workers':>7}  {'logins/s':>10}  {'p50 ms':>8}  {'p95 ms':>8}  {'shed':>6}")
+    for workers in worker_counts:
+        run(workers, logins, request_threads)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+"""Micro-benchmark: per-request prompt building vs the precompiled registry.
+
+The "inline" variant reproduces what generate_content used to do on every
+request (rebuild the purpose/example/language maps and format the whole
+prompt with an f-string); "registry" calls prompt_templates.render_prompt.
+
+Usage: python scripts/bench_prompts.py [iterations]
+"""
+import os
+import sys
+import timeit
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import prompt_templates  # noqa: E402
+
+FIELDS = dict(
+    page_name='MOT Genius', prompt='ကော်ဖီဆိုင် ဖွင့်ပွဲ', purpose='announcement',
+    writing_style='friendly', audience='Yangon coffee lovers', word_count='300',
+    keywords='coffee, opening', hashtags='#MOT', cta='Visit us today',
+    negative_constraints='no prices', language='myanmar', include_emojis=True
+)
+
+
+def inline_prompt(page_name, prompt, purpose, writing_style, audience, word_count,
+                  keywords, hashtags, cta, negative_constraints, language, include_emojis):
+    # Per-request construction, as the view function used to do it
+    language_instructions = dict(prompt_templates.LANGUAGE_INSTRUCTIONS)
+    language_instruction = language_instructions.get(language, prompt_templates.DEFAULT_LANGUAGE_INSTRUCTION)
+    emoji_instruction = prompt_templates.emoji_instruction.__wrapped__(include_emojis, word_count)
+    purpose_map = {key: p.description for key, p in prompt_templates.PURPOSES.items()}
+    content_style_examples = {key: p.example for key, p in prompt_templates.PURPOSES.items()}
+    purpose_text = purpose_map.get(purpose, purpose) if purpose else 'General content'
+    style_example = content_style_examples.get(purpose, "")
+    return f"""You are a 10 years experience social media content writer. Directly generate a social media post. Do not include any introductory phrases, explanations, or preambles. {language_instruction}{emoji_instruction}
+
+{style_example}
+
+IMPORTANT: Use the example above as a REFERENCE for style, format, structure, and tone. DO NOT copy the example content. Create NEW and ORIGINAL content based on the topic and requirements below, but follow the same writing style, formatting patterns, and engagement approach shown in the example.
+
+Page/Brand Name: {page_name}
+Topic: {prompt}
+Purpose: {purpose_text}
+Writing Style: {writing_style}
+Target Audience: {audience}
+Word Count: Approximately {word_count} words
+Keywords to include: {keywords}
+Hashtags to include: {hashtags}
+Call to Action: {cta}
+Avoid/Don't include: {negative_constraints}
+        """
+
+
+def registry_prompt(**fields):
+    return prompt_templates.render_prompt('text', **fields)
+
+
+def measure(name, func, iterations):
+    seconds = min(timeit.repeat(lambda: func(**FIELDS), number=iterations, repeat=5))
+    tracemalloc.start()
+    for _ in range(100):
+        func(**FIELDS)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    per_call_us = seconds / iterations * 1e6
+    print(f"{name:<10} {per_call_us:8.2f} us/call   peak {peak / 1024:8.1f} KiB over 100 calls")
+    return per_call_us
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    assert inline_prompt(**FIELDS) == registry_prompt(**FIELDS)
+    inline = measure('inline', inline_prompt, iterations)
+    registry = measure('registry', registry_prompt, iterations)
+    print(f"saved      {inline - registry:8.2f} us/call ({(1 - registry / inline) * 100:.0f}%)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+"""Check that concurrent admin dashboard misses recompute the statistics once.
+
+Drops the admin statistics snapshot, then has parallel requests read it while
+the counts are slowed down, and exits non-zero if more than one of them ran
+the aggregate queries or they got different snapshots. No rows are changed in
+the database at DATABASE_URL (meant for a local Postgres).
+
+Usage: DATABASE_URL=postgresql://localhost/autowriter_dev \
+       python scripts/check_admin_stats.py [parallel_requests]
+"""
+import os
+import sys
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Skip init_db at import; the schema is set up explicitly below
+os.environ.setdefault('VERCEL', '1')
+
+from flask_sqlalchemy.query import Query  # noqa: E402
+from app import app, db, get_admin_stats, invalidate_admin_stats  # noqa: E402
+
+COUNT_DELAY = 0.3  # seconds added to every COUNT so the misses overlap
+
+
+def main():
+    requests = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+
+    with app.app_context():
+        db.create_all()
+        invalidate_admin_stats()
+
+    counts = []
+    counts_lock = threading.Lock()
+    count = Query.count
+
+    def slow_count(query):
+        with counts_lock:
+            counts.append(1)
+        time.sleep(COUNT_DELAY)
+        return count(query)
+
+    def read(_):
+        with app.app_context():
+            return get_admin_stats()['computed_at']
+
+    Query.count = slow_count
+    try:
+        with ThreadPoolExecutor(max_workers=requests) as pool:
+            snapshots = set(pool.map(read, range(requests)))
+    finally:
+        Query.count = count
+
+    # One recompute runs two COUNTs (users and contents)
+    ok = len(counts) == 2 and len(snapshots) == 1
+    print(f"{'ok  ' if ok else 'FAIL'}  {requests} concurrent misses: "
+          f"{len(counts) // 2} recompute(s), {len(snapshots)} distinct snapshot(s)")
+    if not ok:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+"""Check that the hot Content/User queries are served by indexes.
+
+Seeds users and contents into the database at DATABASE_URL (meant for a local
+Postgres), runs EXPLAIN on each hot query and exits non-zero if any plan has a
+sequential scan on "user" or content. Seeding happens inside a transaction
+that is rolled back, so only the tables, extension and indexes are left.
+
+Usage: DATABASE_URL=postgresql://localhost/autowriter_dev \
+       python scripts/check_query_plans.py [users] [contents_per_user]
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Skip init_db at import; the schema is set up explicitly below
+os.environ.setdefault('VERCEL', '1')
+
+from sqlalchemy.dialects import postgresql  # noqa: E402
+from app import app, db, User, Content  # noqa: E402
+from create_indexes import create_indexes  # noqa: E402
+
+CHECKED_TABLES = ('user', 'content')
+
+
+def seed(users, contents_per_user):
+    """Insert throwaway rows in the current transaction and refresh planner stats"""
+    db.session.execute(db.text("""
+        INSERT INTO "user" (email, password_hash, is_admin, is_active, created_at,
+                            failed_login_attempts, content_count, image_credits, user_type)
+        SELECT 'plan-check-' || g || '@gmail.com', 'x', false, true, now() - g * interval '1 minute',
+               0, 0, 20, 'normal'
+        FROM generate_series(1, :users) g
+    """), {'users': users})
+    db.session.execute(db.text("""
+        INSERT INTO content (user_id, title, content, published, created_at, updated_at)
+        SELECT u.id, 'Post ' || g, repeat('text ', 40), g % 3 = 0,
+               now() - (u.id * :per_user + g) * interval '1 second', now()
+        FROM "user" u CROSS JOIN generate_series(1, :per_user) g
+        WHERE u.email LIKE 'plan-check-%'
+    """), {'per_user': contents_per_user})
+    db.session.execute(db.text('ANALYZE "user"'))
+    db.session.execute(db.text('ANALYZE content'))
+    return db.session.execute(db.text(
+        "SELECT id FROM \"user\" WHERE email = 'plan-check-1@gmail.com'"
+    )).scalar()
+
+
+def hot_queries(user_id):
+    """The queries behind the dashboards, as the views build them"""
+    count = db.func.count(Content.id)
+    return [
+        ('recent contents', Content.query.filter_by(user_id=user_id)
+            .order_by(Content.created_at.desc()).limit(3)),
+        ('content count', db.session.query(count).filter(Content.user_id == user_id)),
+        ('dashboard page', Content.query.filter_by(user_id=user_id)
+            .order_by(Content.created_at.desc()).offset(10).limit(10)),
+        ('dashboard page (keyset)', Content.query.filter_by(user_id=user_id)
+            .filter(db.tuple_(Content.created_at, Content.id) < (db.func.now(), 0))
+            .order_by(Content.created_at.desc(), Content.id.desc()).limit(11)),
+        ('published count', db.session.query(count)
+            .filter(Content.user_id == user_id, Content.published == True)),  # noqa: E712
+        ('admin recent contents', Content.query.order_by(Content.created_at.desc()).limit(3)),
+        ('admin email search', User.query.filter(User.email.contains('check-1234'))
+            .order_by(User.created_at.desc()).limit(10)),
+    ]
+
+
+def seq_scans(plan):
+    """Yield relations read with a sequential scan anywhere in an EXPLAIN JSON plan"""
+    if plan.get('Node Type') == 'Seq Scan' and plan.get('Relation Name') in CHECKED_TABLES:
+        yield plan['Relation Name']
+    for child in plan.get('Plans', []):
+        yield from seq_scans(child)
+
+
+def main():
+    users = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    contents_per_user = int(sys.argv[2]) if len(sys.argv) > 2 else 25
+
+    failures = 0
+    with app.app_context():
+        db.create_all()
+        create_indexes()
+
+        try:
+            user_id = seed(users, contents_per_user)
+            print(f"Seeded {users} users x {contents_per_user} contents")
+            for name, query in hot_queries(user_id):
+                sql = str(query.statement.compile(dialect=postgresql.dialect(),
+                                                  compile_kwargs={'literal_binds': True}))
+                plan = db.session.execute(db.text(f"EXPLAIN (FORMAT JSON) {sql}")).scalar()[0]['Plan']
+                scanned = sorted(set(seq_scans(plan)))
+                if scanned:
+                    failures += 1
+                    print(f"FAIL  {name}: Seq Scan on {', '.join(scanned)}")
+                    print(db.session.execute(db.text(f"EXPLAIN {sql}")).scalars().all())
+                else:
+                    print(f"ok    {name}: {plan['Node Type']} (cost {plan['Total Cost']})")
+        finally:
+            db.session.rollback()
+
+    if failures:
+        print(f"{failures} hot queries fall back to sequential scans")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+"""Check that content quota and image credits hold under concurrent requests.
+
+Creates a throwaway trial user in the database at DATABASE_URL (meant for a
+local Postgres), fires parallel reservations at it and exits non-zero if more
+succeed than the quota allows or the stored counters drift. It also checks
+that cancelling a stream served from the result cache doesn't refund a
+generation it never reserved. The user is deleted afterwards.
+
+Usage: DATABASE_URL=postgresql://localhost/autowriter_dev \
+       python scripts/check_quota_concurrency.py [parallel_requests]
+"""
+import os
+import sys
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Skip init_db at import; the schema is set up explicitly below
+os.environ.setdefault('VERCEL', '1')
+
+from flask_login import login_user  # noqa: E402
+from app import (app, db, User, TRIAL_CONTENT_LIMIT, reserve_content_quota,  # noqa: E402
+                 refund_content_quota, reserve_image_credits, refund_image_credits,
+                 _generation_cache_key, _store_generation_result)
+
+IMAGE_CREDITS = 20
+IMAGES_PER_REQUEST = 3
+
+
+def run_parallel(func, requests):
+    """Call func requests times at once, each in its own app context"""
+    def call(_):
+        with app.app_context():
+            return func()
+    with ThreadPoolExecutor(max_workers=requests) as pool:
+        return list(pool.map(call, range(requests)))
+
+
+def check(name, expected, actual):
+    ok = expected == actual
+    print(f"{'ok  ' if ok else 'FAIL'}  {name}: expected {expected}, got {actual}")
+    return ok
+
+
+def cancelled_cached_stream_count(user_id):
+    """Serve a cached result over the stream, hang up after the first event and return content_count"""
+    app.config['WTF_CSRF_ENABLED'] = False
+    app.config['GENERATION_CACHE_TTL'] = app.config['GENERATION_CACHE_TTL'] or 60
+    form = {'pageName': 'Quota check', 'prompt': f'cached stream {uuid.uuid4().hex}'}
+    with app.test_request_context('/generate-content/stream', method='POST', data=form):
+        login_user(db.session.get(User, user_id))
+        _store_generation_result(_generation_cache_key(), 'cached post')
+
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = str(user_id)
+        session['_fresh'] = True
+    response = client.post('/generate-content/stream', data=form, buffered=False)
+    next(response.response)  # the cached chunk
+    response.close()  # client disconnects before 'done'
+
+    with app.app_context():
+        return db.session.get(User, user_id).content_count
+
+
+def main():
+    requests = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+
+    with app.app_context():
+        db.create_all()
+        user = User(email=f'quota-check-{uuid.uuid4().hex[:8]}@gmail.com', password_hash='x',
+                    user_type='trial', content_count=0, image_credits=IMAGE_CREDITS)
+        db.session.add(user)
+        db.session.commit()
+        user_id = user.id
+
+    results = []
+    try:
+        granted = run_parallel(lambda: reserve_content_quota(user_id), requests)
+        results.append(check('content reservations granted', TRIAL_CONTENT_LIMIT,
+                             sum(count is not None for count in granted)))
+        results.append(check('distinct content counts', TRIAL_CONTENT_LIMIT,
+                             len({count for count in granted if count is not None})))
+
+        run_parallel(lambda: refund_content_quota(user_id), 2)
+        images = run_parallel(lambda: reserve_image_credits(user_id, IMAGES_PER_REQUEST), requests)
+        image_grants = sum(credits is not None for credits in images)
+        results.append(check('image reservations granted', IMAGE_CREDITS // IMAGES_PER_REQUEST, image_grants))
+        run_parallel(lambda: refund_image_credits(user_id, IMAGES_PER_REQUEST), 1)
+
+        with app.app_context():
+            user = db.session.get(User, user_id)
+            results.append(check('stored content_count', TRIAL_CONTENT_LIMIT - 2, user.content_count))
+            results.append(check('stored image_credits',
+                                 IMAGE_CREDITS - (image_grants - 1) * IMAGES_PER_REQUEST, user.image_credits))
+            user.api_key = 'quota-check'
+            db.session.commit()
+
+        results.append(check('content_count after cancelled cached stream', TRIAL_CONTENT_LIMIT - 2,
+                             cancelled_cached_stream_count(user_id)))
+    finally:
+        with app.app_context():
+            db.session.execute(db.delete(User).where(User.id == user_id))
+            db.session.commit()
+
+    if not all(results):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+"""Create the Content/User indexes on a live database without blocking writes.
+
+db.create_all only creates indexes together with new tables, so indexes added
+to the models later have to be built on the existing tables. This script builds
+each one with CREATE INDEX CONCURRENTLY, outside a transaction and with no
+statement timeout. The tables stay writable while it runs. Run it once per
+deploy that adds an index. It is safe to re-run: existing valid indexes are
+skipped, and invalid leftovers from an interrupted build are dropped and rebuilt.
+
+The email search index needs the pg_trgm extension; it is skipped (with a
+warning) when the extension can't be installed.
+
+Usage: DATABASE_URL=postgresql://... python scripts/create_indexes.py
+"""
+import os
+import sys
+import logging
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Skip init_db at import; this script only touches indexes
+os.environ.setdefault('VERCEL', '1')
+
+from sqlalchemy.dialects import postgresql  # noqa: E402
+from sqlalchemy.schema import CreateIndex  # noqa: E402
+from app import app, db, User, Content  # noqa: E402
+
+# Admin search uses email LIKE '%term%', which a btree can't serve. Kept out of
+# User.__table_args__ so create_all works on databases without pg_trgm.
+EMAIL_TRGM_INDEX = 'ix_user_email_trgm'
+EMAIL_TRGM_SQL = f'CREATE INDEX CONCURRENTLY IF NOT EXISTS {EMAIL_TRGM_INDEX} ON "user" USING gin (email gin_trgm_ops)'
+
+
+def ensure_trgm(conn):
+    """Install pg_trgm if possible; returns True when the extension is available"""
+    try:
+        conn.execute(db.text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+    except Exception as e:
+        logging.warning(f"Could not install pg_trgm: {e}")
+    return conn.execute(db.text("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")).scalar() is not None
+
+
+def model_index_statements():
+    """(name, CREATE INDEX CONCURRENTLY IF NOT EXISTS ...) for every model index"""
+    dialect = postgresql.dialect()
+    for table in (User.__table__, Content.__table__):
+        for index in table.indexes:
+            index.dialect_kwargs['postgresql_concurrently'] = True
+            yield index.name, str(CreateIndex(index, if_not_exists=True).compile(dialect=dialect))
+
+
+def build_index(conn, name, statement):
+    """Build one index concurrently, replacing an invalid leftover first"""
+    valid = conn.execute(db.text(
+        "SELECT i.indisvalid FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid WHERE c.relname = :name"
+    ), {'name': name}).scalar()
+    if valid:
+        print(f"ok       {name}")
+        return True
+    if valid is False:
+        # A failed CONCURRENTLY build leaves an invalid index that IF NOT EXISTS would skip
+        conn.execute(db.text(f'DROP INDEX CONCURRENTLY IF EXISTS "{name}"'))
+    try:
+        conn.execute(db.text(statement))
+    except Exception as e:
+        print(f"FAIL     {name}: {e}")
+        return False
+    print(f"created  {name}")
+    return True
+
+
+def create_indexes():
+    """Build all indexes; returns the number that could not be created"""
+    failures = 0
+    # CONCURRENTLY can't run inside a transaction block
+    with db.engine.connect().execution_options(isolation_level='AUTOCOMMIT') as conn:
+        conn.execute(db.text("SET statement_timeout = 0"))
+        for name, statement in model_index_statements():
+            failures += not build_index(conn, name, statement)
+        if ensure_trgm(conn):
+            failures += not build_index(conn, EMAIL_TRGM_INDEX, EMAIL_TRGM_SQL)
+        else:
+            print(f"skipped  {EMAIL_TRGM_INDEX}: pg_trgm extension unavailable")
+    return failures
+
+
+def main():
+    with app.app_context():
+        failures = create_indexes()
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()